@@ -0,0 +1,30 @@
+-- Tables as the handlers first used them. Later migrations build on these; on databases
+-- created before migrations were tracked every statement here is a no-op.
+
+-- One row per scraped post, keyed by its Reddit id
+CREATE TABLE IF NOT EXISTS reddit_posts (
+    id BIGSERIAL PRIMARY KEY,
+    post_id TEXT NOT NULL UNIQUE,
+    ticker TEXT NOT NULL,
+    subreddit TEXT NOT NULL,
+    title TEXT,
+    content TEXT,
+    processed_content TEXT,
+    score INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP,
+    created_date DATE,
+    sentiment DOUBLE PRECISION
+);
+
+-- Average score-weighted sentiment per (ticker, subreddit, day), id is '<ticker>_<subreddit>'
+CREATE TABLE IF NOT EXISTS ticker_sentiment (
+    id TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    subreddit TEXT NOT NULL,
+    sentiment DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sample_size INTEGER NOT NULL DEFAULT 0,
+    calculated_at TIMESTAMP NOT NULL DEFAULT now(),
+    date DATE,
+    date_str TEXT,
+    UNIQUE (id, date_str)
+);
@@ -0,0 +1,14 @@
+-- Running sums for incremental sentiment scoring in sentiment_analyzer.analyze_sentiment
+
+-- Weighted sentiment each post currently contributes to its ticker_sentiment bucket
+ALTER TABLE reddit_posts ADD COLUMN IF NOT EXISTS weighted_sentiment DOUBLE PRECISION;
+UPDATE reddit_posts SET weighted_sentiment = sentiment * score WHERE sentiment IS NOT NULL AND weighted_sentiment IS NULL;
+
+-- Sum of weighted sentiment per bucket, sentiment is kept as sentiment_sum / sample_size
+ALTER TABLE ticker_sentiment ADD COLUMN IF NOT EXISTS sentiment_sum DOUBLE PRECISION NOT NULL DEFAULT 0;
+UPDATE ticker_sentiment SET sentiment_sum = sentiment * sample_size WHERE sentiment_sum = 0;
+
+-- Incremental runs only look at posts that still need a score
+CREATE INDEX IF NOT EXISTS reddit_posts_unscored_idx
+    ON reddit_posts (ticker, subreddit)
+    WHERE sentiment IS NULL AND processed_content IS NOT NULL;
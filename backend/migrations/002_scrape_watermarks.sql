@@ -0,0 +1,9 @@
+-- Newest post stored per (ticker, subreddit), used by collect_data for incremental scrapes
+CREATE TABLE IF NOT EXISTS scrape_watermarks (
+    ticker TEXT NOT NULL,
+    subreddit TEXT NOT NULL,
+    last_created_utc DOUBLE PRECISION NOT NULL,
+    last_post_id TEXT NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (ticker, subreddit)
+);
@@ -0,0 +1,44 @@
+-- Pre-aggregated structures maintained by sentiment_analyzer.analyze_sentiment for the dashboard API
+
+-- (ticker, subreddit) pairs with sentiment, answers /tickers and /subreddits
+CREATE TABLE IF NOT EXISTS sentiment_catalog (
+    ticker TEXT NOT NULL,
+    subreddit TEXT NOT NULL,
+    first_date DATE NOT NULL,
+    last_date DATE NOT NULL,
+    sample_size BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (ticker, subreddit)
+);
+
+-- Daily, weekly and monthly sentiment series per (ticker, subreddit), one indexed range per chart
+CREATE TABLE IF NOT EXISTS sentiment_rollups (
+    ticker TEXT NOT NULL,
+    subreddit TEXT NOT NULL,
+    period TEXT NOT NULL CHECK (period IN ('day', 'week', 'month')),
+    period_start DATE NOT NULL,
+    sentiment DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sentiment_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sample_size BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (ticker, subreddit, period, period_start)
+);
+
+-- Backfill both from the existing daily buckets
+INSERT INTO sentiment_rollups (ticker, subreddit, period, period_start, sentiment, sentiment_sum, sample_size, updated_at)
+SELECT ticker, subreddit, period, period_start,
+       COALESCE(SUM(sentiment_sum) / NULLIF(SUM(sample_size), 0), 0), SUM(sentiment_sum), SUM(sample_size), MAX(calculated_at)
+FROM (
+    SELECT ticker, subreddit, p.period, date_trunc(p.period, date)::date AS period_start, sentiment_sum, sample_size, calculated_at
+    FROM ticker_sentiment CROSS JOIN (VALUES ('day'), ('week'), ('month')) AS p(period)
+    WHERE date IS NOT NULL
+) AS buckets
+GROUP BY ticker, subreddit, period, period_start
+ON CONFLICT (ticker, subreddit, period, period_start) DO NOTHING;
+
+INSERT INTO sentiment_catalog (ticker, subreddit, first_date, last_date, sample_size, updated_at)
+SELECT ticker, subreddit, MIN(date), MAX(date), SUM(sample_size), MAX(calculated_at)
+FROM ticker_sentiment
+WHERE date IS NOT NULL
+GROUP BY ticker, subreddit
+ON CONFLICT (ticker, subreddit) DO NOTHING;
@@ -0,0 +1,9 @@
+-- Version stamp bumped by sentiment_analyzer at the end of every run that changed sentiment.
+-- The dashboard API caches responses per version and LISTENs on sentiment_updated to drop them.
+CREATE TABLE IF NOT EXISTS sentiment_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+INSERT INTO sentiment_version (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
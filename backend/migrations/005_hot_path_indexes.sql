@@ -0,0 +1,41 @@
+-- Indexes matched to the hot queries, and ticker_sentiment keyed on its date column.
+-- NULLS NOT DISTINCT needs Postgres 15 or later.
+
+-- Preprocessing backlog: WHERE ticker = %s AND processed_content IS NULL ORDER BY post_id
+CREATE INDEX IF NOT EXISTS reddit_posts_unprocessed_idx
+    ON reddit_posts (ticker, post_id)
+    WHERE processed_content IS NULL;
+
+-- Full rebuilds and local analysis: WHERE ticker = ANY(%s) AND subreddit = ANY(%s) AND processed_content IS NOT NULL
+CREATE INDEX IF NOT EXISTS reddit_posts_processed_idx
+    ON reddit_posts (ticker, subreddit)
+    WHERE processed_content IS NOT NULL;
+
+-- Scraper priorities: WHERE ticker = ANY(%s) AND created_date >= CURRENT_DATE - 7
+CREATE INDEX IF NOT EXISTS reddit_posts_ticker_created_date_idx
+    ON reddit_posts (ticker, created_date);
+
+-- date_str duplicated date as text. Fill date where only the text was set, keep the
+-- latest row of any (id, date) duplicates, then key the table on (id, date). Rows without
+-- a date (posts with no created_date, and local all-time snapshots) share one NULL bucket.
+-- A re-run finds date_str already gone.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = 'ticker_sentiment' AND column_name = 'date_str') THEN
+        UPDATE ticker_sentiment SET date = date_str::date WHERE date IS NULL AND date_str IS NOT NULL;
+    END IF;
+END
+$$;
+
+DELETE FROM ticker_sentiment AS t
+USING ticker_sentiment AS newer
+WHERE t.id = newer.id
+  AND t.date IS NOT DISTINCT FROM newer.date
+  AND (t.calculated_at, t.ctid) < (newer.calculated_at, newer.ctid);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ticker_sentiment_id_date_key
+    ON ticker_sentiment (id, date) NULLS NOT DISTINCT;
+
+-- Drops the (id, date_str) unique constraint with the column
+ALTER TABLE ticker_sentiment DROP COLUMN IF EXISTS date_str;
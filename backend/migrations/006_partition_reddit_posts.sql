@@ -0,0 +1,90 @@
+-- Range-partition reddit_posts by month of created_date. Writers call
+-- ensure_reddit_posts_partitions for the months of each batch before inserting, and
+-- backend/scripts/archive_partitions.py detaches and archives old months.
+-- The primary key has to include the partition key, so posts are unique on (post_id, created_date).
+
+-- Rebuilding an already partitioned table would lose it, and 008 has since changed the
+-- function's return type, so a re-run skips the whole migration.
+DO $migration$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE oid = to_regclass('reddit_posts') AND relkind = 'p') THEN
+        RETURN;
+    END IF;
+
+    -- Create the monthly partitions covering the given dates, named reddit_posts_yYYYYmMM
+    CREATE OR REPLACE FUNCTION ensure_reddit_posts_partitions(dates DATE[]) RETURNS VOID AS $fn$
+    DECLARE
+        month_start DATE;
+    BEGIN
+        FOR month_start IN SELECT DISTINCT date_trunc('month', d)::date FROM unnest(dates) AS d WHERE d IS NOT NULL LOOP
+            BEGIN
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF reddit_posts FOR VALUES FROM (%L) TO (%L)',
+                    'reddit_posts_' || to_char(month_start, '"y"YYYY"m"MM'),
+                    month_start,
+                    (month_start + INTERVAL '1 month')::date
+                );
+            EXCEPTION WHEN duplicate_table THEN
+                -- another writer created it concurrently
+                NULL;
+            END;
+        END LOOP;
+    END;
+    $fn$ LANGUAGE plpgsql;
+
+    -- Move the old table and the names it holds out of the way
+    ALTER TABLE reddit_posts RENAME TO reddit_posts_unpartitioned;
+    ALTER INDEX IF EXISTS reddit_posts_pkey RENAME TO reddit_posts_unpartitioned_pkey;
+    ALTER SEQUENCE IF EXISTS reddit_posts_id_seq RENAME TO reddit_posts_unpartitioned_id_seq;
+
+    CREATE TABLE reddit_posts (
+        id BIGSERIAL,
+        post_id TEXT NOT NULL,
+        ticker TEXT NOT NULL,
+        subreddit TEXT NOT NULL,
+        title TEXT,
+        content TEXT,
+        processed_content TEXT,
+        score INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP,
+        created_date DATE NOT NULL,
+        sentiment DOUBLE PRECISION,
+        weighted_sentiment DOUBLE PRECISION,
+        PRIMARY KEY (post_id, created_date)
+    ) PARTITION BY RANGE (created_date);
+
+    -- Rows written before created_date was populated fall back to their timestamp
+    PERFORM ensure_reddit_posts_partitions(
+        ARRAY(SELECT DISTINCT COALESCE(created_date, created_at::date) FROM reddit_posts_unpartitioned) || CURRENT_DATE
+    );
+
+    INSERT INTO reddit_posts (id, post_id, ticker, subreddit, title, content, processed_content, score, created_at, created_date, sentiment, weighted_sentiment)
+    SELECT id, post_id, ticker, subreddit, title, content, processed_content, score, created_at,
+           COALESCE(created_date, created_at::date), sentiment, weighted_sentiment
+    FROM reddit_posts_unpartitioned
+    WHERE COALESCE(created_date, created_at::date) IS NOT NULL;
+
+    PERFORM setval(pg_get_serial_sequence('reddit_posts', 'id'), COALESCE((SELECT MAX(id) FROM reddit_posts), 0) + 1, false);
+
+    DROP TABLE reddit_posts_unpartitioned;
+
+    -- Indexes from 001 and 005, now created on every partition. The analyzer writes scores
+    -- back by (id, created_date), which prunes to one partition.
+    CREATE INDEX reddit_posts_id_idx ON reddit_posts (id);
+
+    CREATE INDEX reddit_posts_unscored_idx
+        ON reddit_posts (ticker, subreddit)
+        WHERE sentiment IS NULL AND processed_content IS NOT NULL;
+
+    CREATE INDEX reddit_posts_unprocessed_idx
+        ON reddit_posts (ticker, post_id)
+        WHERE processed_content IS NULL;
+
+    CREATE INDEX reddit_posts_processed_idx
+        ON reddit_posts (ticker, subreddit)
+        WHERE processed_content IS NOT NULL;
+
+    CREATE INDEX reddit_posts_ticker_created_date_idx
+        ON reddit_posts (ticker, created_date);
+END
+$migration$;
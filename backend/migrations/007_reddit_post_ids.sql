@@ -0,0 +1,18 @@
+-- Since 006, reddit_posts is only unique on (post_id, created_date), so a post whose date was
+-- computed differently by two writers could be stored in two partitions. reddit_post_ids keeps
+-- each post_id once, with the created_date it was first stored under. Writers claim a post's
+-- date here before upserting it and use the stored date from then on.
+CREATE TABLE IF NOT EXISTS reddit_post_ids (
+    post_id TEXT PRIMARY KEY,
+    created_date DATE NOT NULL
+);
+
+-- Posts already stored more than once keep their earliest row. If any were removed, run the
+-- sentiment analyzer with full_rebuild to drop their second count from the running sums.
+DELETE FROM reddit_posts AS p
+USING reddit_posts AS q
+WHERE p.post_id = q.post_id AND p.created_date > q.created_date;
+
+INSERT INTO reddit_post_ids (post_id, created_date)
+SELECT post_id, created_date FROM reddit_posts
+ON CONFLICT (post_id) DO NOTHING;
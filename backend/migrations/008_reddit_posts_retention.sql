@@ -0,0 +1,41 @@
+-- Retention watermark for reddit_posts, moved forward by backend/scripts/archive_partitions.py
+-- before it detaches anything. Months before the cutoff have been archived or detached and are
+-- never created again: their archive would be overwritten and a detached table could shadow
+-- the new partition. ensure_reddit_posts_partitions skips them and returns the cutoff so
+-- writers can drop posts older than it.
+CREATE TABLE IF NOT EXISTS reddit_posts_retention (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    cutoff DATE,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+INSERT INTO reddit_posts_retention (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
+
+-- The return type changes, so the function from 006 has to be dropped first
+DROP FUNCTION IF EXISTS ensure_reddit_posts_partitions(DATE[]);
+
+CREATE FUNCTION ensure_reddit_posts_partitions(dates DATE[]) RETURNS DATE AS $$
+DECLARE
+    month_start DATE;
+    retention_cutoff DATE;
+BEGIN
+    SELECT cutoff INTO retention_cutoff FROM reddit_posts_retention;
+    FOR month_start IN
+        SELECT DISTINCT date_trunc('month', d)::date FROM unnest(dates) AS d
+        WHERE d IS NOT NULL AND (retention_cutoff IS NULL OR d >= retention_cutoff)
+    LOOP
+        BEGIN
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF reddit_posts FOR VALUES FROM (%L) TO (%L)',
+                'reddit_posts_' || to_char(month_start, '"y"YYYY"m"MM'),
+                month_start,
+                (month_start + INTERVAL '1 month')::date
+            );
+        EXCEPTION WHEN duplicate_table THEN
+            -- another writer created it concurrently
+            NULL;
+        END;
+    END LOOP;
+    RETURN retention_cutoff;
+END;
+$$ LANGUAGE plpgsql;
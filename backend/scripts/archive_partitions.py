@@ -0,0 +1,152 @@
+import argparse
+import gzip
+import os
+import re
+import sys
+from datetime import date
+
+HANDLERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'handlers')
+sys.path.insert(0, HANDLERS_DIR)
+
+from db import connect_db, release_db
+
+REDDIT_POSTS_RETENTION_MONTHS = int(os.getenv('REDDIT_POSTS_RETENTION_MONTHS', 24))
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive')
+
+# Monthly partitions are named reddit_posts_yYYYYmMM by ensure_reddit_posts_partitions, and
+# renamed reddit_posts_yYYYYmMM_detached once detached
+PARTITION_PATTERN = re.compile(r'^(reddit_posts_y(\d{4})m(\d{2}))(_detached)?$')
+
+# Monthly partitions of reddit_posts, oldest first, as (month start, name, month name, attached).
+# Tables detached by an earlier run that stopped before archiving them are listed as not attached.
+def list_partitions(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT c.relname, EXISTS (SELECT 1 FROM pg_inherits WHERE pg_inherits.inhrelid = c.oid)
+        FROM pg_class AS c
+        WHERE c.relkind = 'r' AND c.relnamespace = 'public'::regnamespace AND c.relname ~ '^reddit_posts_y[0-9]{4}m[0-9]{2}(_detached)?$'
+    """)
+    partitions = []
+    for name, attached in cursor.fetchall():
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            partitions.append((date(int(match.group(2)), int(match.group(3)), 1), name, match.group(1), attached))
+    cursor.close()
+    conn.commit()
+    return sorted(partitions)
+
+def retention_cutoff(keep_months, today=None):
+    today = today or date.today()
+    months = today.year * 12 + today.month - 1 - keep_months
+    return date(months // 12, months % 12 + 1, 1)
+
+# Stream a partition to a gzipped CSV with a header row, named after its month. The file is
+# written under a temporary name and renamed once complete, so a partial archive is never
+# mistaken for a full one. An existing archive is never overwritten.
+def archive_partition(conn, name, month_name, archive_dir):
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{month_name}.csv.gz")
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists, move it away to archive {name} again")
+    cursor = conn.cursor()
+    with open(path + '.tmp', 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+            cursor.copy_expert(f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER)', f)
+        raw.flush()
+        os.fsync(raw.fileno())
+    cursor.close()
+    os.replace(path + '.tmp', path)
+    return path
+
+# Move the retention cutoff forward, never back, so writers stop recreating the expired months
+# before any of them is detached
+def advance_retention_cutoff(conn, cutoff):
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE reddit_posts_retention
+        SET cutoff = GREATEST(cutoff, %s), updated_at = now()
+        RETURNING cutoff
+    """, (cutoff,))
+    (cutoff,) = cursor.fetchone()
+    conn.commit()
+    cursor.close()
+    return cutoff
+
+# reddit_post_ids rows for posts before the cutoff guard nothing any more: a post that comes
+# back is dated from its UTC timestamp, lands before the cutoff again and is dropped by the
+# writer. One scan of the table per run.
+def prune_post_ids(conn, cutoff):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM reddit_post_ids WHERE created_date < %s", (cutoff,))
+    pruned = cursor.rowcount
+    conn.commit()
+    cursor.close()
+    if pruned:
+        print(f"Pruned {pruned} reddit_post_ids rows before {cutoff}")
+    return pruned
+
+# Detach every monthly partition older than the retention window, archive its rows and
+# drop it, then prune their posts from reddit_post_ids. Aggregates in ticker_sentiment and
+# sentiment_rollups are kept. Detached tables are
+# renamed with a _detached suffix, and with drop=False they are left in place, to be archived
+# or re-attached by hand.
+def apply_retention(conn, keep_months=REDDIT_POSTS_RETENTION_MONTHS, archive_dir=ARCHIVE_DIR, drop=True, dry_run=False):
+    cutoff = retention_cutoff(keep_months)
+    if not dry_run:
+        cutoff = advance_retention_cutoff(conn, cutoff)
+    expired = [(name, month_name, attached) for month, name, month_name, attached in list_partitions(conn) if month < cutoff]
+    if not expired:
+        print(f"No reddit_posts partitions before {cutoff}")
+        if not dry_run:
+            prune_post_ids(conn, cutoff)
+        return True
+
+    for name, month_name, attached in expired:
+        if dry_run:
+            print(f"Would archive {name}")
+            continue
+        cursor = conn.cursor()
+        try:
+            if name == month_name:
+                if attached:
+                    cursor.execute(f'ALTER TABLE reddit_posts DETACH PARTITION "{name}"')
+                name = f"{month_name}_detached"
+                cursor.execute(f'ALTER TABLE "{month_name}" RENAME TO "{name}"')
+                conn.commit()
+                print(f"Detached {month_name} as {name}")
+            if not drop:
+                continue
+
+            path = archive_partition(conn, name, month_name, archive_dir)
+            cursor.execute(f'DROP TABLE "{name}"')
+            conn.commit()
+            print(f"Archived {name} to {path}")
+        except Exception as e:
+            conn.rollback()
+            print(f"Error archiving {name}:", e)
+            return False
+        finally:
+            cursor.close()
+    if not dry_run and drop:
+        prune_post_ids(conn, cutoff)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Detach and archive reddit_posts partitions older than the retention window')
+    parser.add_argument('--keep-months', type=int, default=REDDIT_POSTS_RETENTION_MONTHS, help=f'Months of posts to keep attached, besides the current one (default: {REDDIT_POSTS_RETENTION_MONTHS})')
+    parser.add_argument('--archive-dir', type=str, default=ARCHIVE_DIR, help=f'Directory for the gzipped CSV archives (default: {ARCHIVE_DIR})')
+    parser.add_argument('--detach-only', action='store_true', help='Detach expired partitions but keep them as standalone tables')
+    parser.add_argument('--dry-run', action='store_true', help='List the partitions that would be archived')
+    args = parser.parse_args()
+
+    conn = connect_db(autocommit=False)
+    if not conn:
+        sys.exit(1)
+    try:
+        ok = apply_retention(conn, args.keep_months, args.archive_dir, not args.detach_only, args.dry_run)
+    finally:
+        release_db(conn)
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+import argparse
+import os
+import nltk
+
+HANDLERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'handlers')
+
+# Corpora the Preprocessor needs (punkt_tab is what newer nltk's word_tokenize loads)
+NLTK_RESOURCES = ['punkt', 'punkt_tab', 'stopwords', 'wordnet']
+
+# Download the corpora next to the handlers so they ship in the deployment package
+# and the Lambda never fetches them at runtime
+def main():
+    parser = argparse.ArgumentParser(description='Bundle NLTK corpora into the collect_data deployment package')
+    parser.add_argument('--target', type=str, default=os.path.join(HANDLERS_DIR, 'nltk_data'), help='Directory to download into (default: handlers/nltk_data)')
+    args = parser.parse_args()
+
+    for resource in NLTK_RESOURCES:
+        nltk.download(resource, download_dir=args.target, quiet=True)
+    print(f"Bundled {', '.join(NLTK_RESOURCES)} into {os.path.abspath(args.target)}")
+
+if __name__ == '__main__':
+    main()
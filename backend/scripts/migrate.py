@@ -0,0 +1,229 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+HANDLERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'handlers')
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'migrations')
+sys.path.insert(0, HANDLERS_DIR)
+
+from db import connect_db, release_db
+
+MIGRATION_PATTERN = re.compile(r'^(\d{3})_(\w+)\.sql$')
+
+# Any value works as long as every runner uses the same one
+MIGRATION_LOCK_ID = 20250301
+
+# The handlers' hot queries and the indexes that must be able to serve them, as
+# (name, query, params, acceptable index names). Sequential scans are disabled while
+# planning, so the check holds on small development databases too (reddit_posts needs at
+# least one partition, migration 006 creates the current month's).
+HOT_QUERIES = [
+    (
+        'preprocess backlog',
+        """
+            SELECT post_id, content FROM reddit_posts
+            WHERE ticker = %s AND processed_content IS NULL AND post_id > %s
+            ORDER BY post_id
+        """,
+        ('AAPL', ''),
+        ['reddit_posts_unprocessed_idx']
+    ),
+    (
+        'unscored posts',
+        """
+            SELECT id, ticker, subreddit, processed_content, score, created_date, weighted_sentiment FROM reddit_posts
+            WHERE ticker = ANY(%s) AND subreddit = ANY(%s) AND processed_content IS NOT NULL AND sentiment IS NULL
+        """,
+        (['AAPL'], ['stocks']),
+        ['reddit_posts_unscored_idx']
+    ),
+    (
+        'full rebuild posts',
+        """
+            SELECT id, ticker, subreddit, processed_content, score, created_date, weighted_sentiment FROM reddit_posts
+            WHERE ticker = ANY(%s) AND subreddit = ANY(%s) AND processed_content IS NOT NULL
+        """,
+        (['AAPL'], ['stocks']),
+        ['reddit_posts_processed_idx']
+    ),
+    (
+        'ticker volumes',
+        """
+            SELECT ticker, COUNT(*) FROM reddit_posts
+            WHERE ticker = ANY(%s) AND created_date >= CURRENT_DATE - 7
+            GROUP BY ticker
+        """,
+        (['AAPL'],),
+        ['reddit_posts_ticker_created_date_idx']
+    ),
+    (
+        'ticker_sentiment upsert',
+        """
+            INSERT INTO ticker_sentiment (id, ticker, subreddit, sentiment, sentiment_sum, sample_size, calculated_at, date)
+            VALUES (%s, %s, %s, 0, 0, 0, now(), CURRENT_DATE)
+            ON CONFLICT (id, date) DO NOTHING
+        """,
+        ('AAPL_stocks', 'AAPL', 'stocks'),
+        ['ticker_sentiment_id_date_key']
+    ),
+    (
+        'rollup series',
+        """
+            SELECT sentiment, sample_size, period_start FROM sentiment_rollups
+            WHERE ticker = %s AND subreddit = %s AND period = %s AND period_start > %s
+            ORDER BY period_start
+            LIMIT 1000
+        """,
+        ('AAPL', 'all', 'day', '2025-01-01'),
+        ['sentiment_rollups_pkey']
+    )
+]
+
+def file_checksum(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+# Migration files in version order, as (version, name, path)
+def discover_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_PATTERN.match(filename)
+        if match:
+            migrations.append((match.group(1), match.group(2), os.path.join(directory, filename)))
+    return migrations
+
+def ensure_migrations_table(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """)
+    conn.commit()
+    cursor.close()
+
+def applied_migrations(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    applied = dict(cursor.fetchall())
+    cursor.close()
+    return applied
+
+# Each migration runs in its own transaction together with its schema_migrations row, so a
+# failed migration leaves nothing behind and the next run retries it. The advisory lock keeps
+# concurrent runners from applying the same file twice.
+def migrate(conn, target=None, dry_run=False):
+    ensure_migrations_table(conn)
+    applied = applied_migrations(conn)
+
+    for version, name, path in discover_migrations():
+        if target and version > target:
+            break
+        if version in applied:
+            if applied[version] != file_checksum(path):
+                print(f"Warning: {version}_{name} changed after it was applied")
+            continue
+        if dry_run:
+            print(f"Pending {version}_{name}")
+            continue
+
+        with open(path) as f:
+            statements = f.read()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+            if cursor.fetchone():
+                conn.rollback()
+                continue
+            # Backfills can outlast the handlers' statement timeout
+            cursor.execute("SET LOCAL statement_timeout = 0")
+            cursor.execute(statements)
+            cursor.execute("""
+                INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)
+            """, (version, name, file_checksum(path)))
+            conn.commit()
+            print(f"Applied {version}_{name}")
+        except Exception as e:
+            conn.rollback()
+            print(f"Error applying {version}_{name}:", e)
+            return False
+        finally:
+            cursor.close()
+    return True
+
+# Every node of an EXPLAIN (FORMAT JSON) plan
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+def indexes_used(plan):
+    used = set()
+    for node in plan_nodes(plan):
+        if 'Index Name' in node:
+            used.add(node['Index Name'])
+        used.update(node.get('Conflict Arbiter Indexes', []))
+    return used
+
+# Plans on partitioned tables name each partition's index, map them to the index they were
+# created from on the parent
+def root_indexes(cursor, names):
+    if not names:
+        return set()
+    cursor.execute("""
+        SELECT COALESCE(pg_partition_root(name::regclass)::text, name) FROM unnest(%s::text[]) AS name
+    """, (sorted(names),))
+    return {root for (root,) in cursor.fetchall()}
+
+# Plan every hot query and report the ones none of whose indexes are used
+def check_plans(conn):
+    failures = 0
+    cursor = conn.cursor()
+    for name, query, params, expected in HOT_QUERIES:
+        try:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            used = root_indexes(cursor, indexes_used(plan[0]['Plan']))
+        except Exception as e:
+            used = set()
+            print(f"Error planning {name}:", e)
+        conn.rollback()
+
+        if used & set(expected):
+            print(f"ok    {name}: {', '.join(sorted(used & set(expected)))}")
+        else:
+            failures += 1
+            print(f"FAIL  {name}: expected one of {', '.join(expected)}, plan uses {', '.join(sorted(used)) or 'no index'}")
+    cursor.close()
+    return failures == 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply the SQL files in backend/migrations in version order')
+    parser.add_argument('--target', type=str, help='Stop after this version, e.g. 004 (default: apply all)')
+    parser.add_argument('--dry-run', action='store_true', help='List pending migrations without applying them')
+    parser.add_argument('--check-plans', action='store_true', help='After migrating, check that the hot queries plan onto their indexes')
+    args = parser.parse_args()
+
+    conn = connect_db(autocommit=False)
+    if not conn:
+        sys.exit(1)
+    try:
+        ok = migrate(conn, args.target, args.dry_run)
+        if ok and args.check_plans:
+            ok = check_plans(conn)
+    finally:
+        release_db(conn)
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
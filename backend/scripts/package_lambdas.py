@@ -0,0 +1,114 @@
+import argparse
+import ast
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+HANDLERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'handlers')
+HANDLERS = ['collect_data', 'reddit_scraper', 'sentiment_analyzer']
+
+# Third-party modules the handlers import and the requirements.txt entry providing each
+THIRD_PARTY = {
+    'psycopg2': 'psycopg2-binary',
+    'nltk': 'nltk',
+    'vaderSentiment': 'vaderSentiment',
+    'praw': 'praw',
+    'prawcore': 'praw',
+    'numpy': 'numpy',
+    'pandas': 'pandas'
+}
+
+# Wheels matching the Lambda runtime rather than the machine building the bundle
+LAMBDA_PLATFORM = os.getenv('LAMBDA_PLATFORM', 'manylinux2014_x86_64')
+LAMBDA_PYTHON_VERSION = os.getenv('LAMBDA_PYTHON_VERSION', '3.11')
+
+# Top-level modules imported anywhere in a source file, including lazy imports inside functions
+def imported_modules(path):
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            modules.add(node.module.split('.')[0])
+    return modules
+
+# The handler and every handlers module it imports, directly or through another one, plus the
+# third-party modules they need
+def handler_sources(handler):
+    sources, third_party = set(), set()
+    pending = [handler]
+    while pending:
+        name = pending.pop()
+        if name in sources:
+            continue
+        sources.add(name)
+        for module in imported_modules(os.path.join(HANDLERS_DIR, f"{name}.py")):
+            if os.path.exists(os.path.join(HANDLERS_DIR, f"{module}.py")):
+                pending.append(module)
+            elif module in THIRD_PARTY:
+                third_party.add(module)
+    return sorted(sources), sorted(third_party)
+
+def install_requirements(requirements, target):
+    subprocess.run([
+        sys.executable, '-m', 'pip', 'install', '--quiet',
+        '--target', target,
+        '--platform', LAMBDA_PLATFORM,
+        '--python-version', LAMBDA_PYTHON_VERSION,
+        '--only-binary=:all:',
+        *requirements
+    ], check=True)
+
+def add_tree(bundle, directory, arcname):
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            bundle.write(path, os.path.join(arcname, os.path.relpath(path, directory)))
+
+# Write handlers/<handler>.zip with the handler, the shared modules it imports and, for
+# collect_data, the NLTK corpora from bundle_nltk_data.py when they have been downloaded.
+# Without dependencies the bundle expects them from a Lambda layer.
+def package(handler, output_dir=HANDLERS_DIR, dependencies=False):
+    sources, third_party = handler_sources(handler)
+    path = os.path.join(output_dir, f"{handler}.zip")
+    with zipfile.ZipFile(path + '.tmp', 'w', zipfile.ZIP_DEFLATED) as bundle:
+        for name in sources:
+            bundle.write(os.path.join(HANDLERS_DIR, f"{name}.py"), f"{name}.py")
+
+        nltk_data = os.path.join(HANDLERS_DIR, 'nltk_data')
+        if 'nltk' in third_party and os.path.isdir(nltk_data):
+            add_tree(bundle, nltk_data, 'nltk_data')
+
+        if dependencies and third_party:
+            target = tempfile.mkdtemp()
+            try:
+                install_requirements(sorted({THIRD_PARTY[module] for module in third_party}), target)
+                add_tree(bundle, target, '')
+            finally:
+                shutil.rmtree(target)
+    os.replace(path + '.tmp', path)
+    print(f"Packaged {handler} ({', '.join(f'{name}.py' for name in sources)}) into {os.path.abspath(path)}")
+    if third_party and not dependencies:
+        print(f"  needs {', '.join(sorted({THIRD_PARTY[module] for module in third_party}))} from a layer")
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the Lambda deployment packages with the shared handler modules')
+    parser.add_argument('handlers', nargs='*', default=HANDLERS, help=f'Handlers to package (default: {", ".join(HANDLERS)})')
+    parser.add_argument('--output-dir', type=str, default=HANDLERS_DIR, help='Directory to write the zips to (default: handlers)')
+    parser.add_argument('--with-dependencies', action='store_true', help=f'Also pip install the third-party packages into each zip, as {LAMBDA_PLATFORM} wheels')
+    args = parser.parse_args()
+
+    for handler in args.handlers:
+        if handler not in HANDLERS:
+            parser.error(f"unknown handler {handler}, choose from {', '.join(HANDLERS)}")
+        package(handler, args.output_dir, args.with_dependencies)
+
+if __name__ == '__main__':
+    main()
@@ -1,144 +1,294 @@
-import subprocess
-import psycopg2
 from psycopg2 import sql
-from datetime import datetime
+from psycopg2.extras import execute_values
 import os
 import json
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
-import re
-import boto3
+from db import DB_POOL_SIZE, connect_db, release_db
+from pipeline import Stage, StagedPipeline, PIPELINE_QUEUE_SIZE
+from post_store import claim_post_dates, created_at_utc, ensure_partitions
+from preprocessor import Preprocessor
+from tickers import post_text, primary_ticker
+from wire_format import STORED_FIELDS, decode_posts
+
+# NLTK corpora bundled into the deployment package by backend/scripts/bundle_nltk_data.py.
+# nltk reads NLTK_DATA when it is first imported, which happens lazily in Preprocessor.
+os.environ.setdefault('NLTK_DATA', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data'))
 
 # Load environment variables
-DB_NAME = os.environ['DB_NAME']
-DB_USER = os.environ['DB_USER']
-DB_PASSWORD = os.environ['DB_PASSWORD']
-DB_HOST = os.environ['DB_HOST']
-DB_PORT = os.environ['DB_PORT']
+DB_BATCH_SIZE = int(os.environ.get('DB_BATCH_SIZE', 500))
+SCRAPER_CONCURRENCY = int(os.environ.get('SCRAPER_CONCURRENCY', 8))
+# Threads preprocessing scraped posts and writing them to the database, each writer holds a pooled
+# connection so writers are capped at DB_POOL_SIZE
+PREPROCESS_WORKERS = int(os.environ.get('PREPROCESS_WORKERS', 2))
+DB_WRITERS = int(os.environ.get('DB_WRITERS', 2))
+# Tickers OR'ed into one search, keeps the query well under Reddit's 512 character limit
+SCRAPER_TICKERS_PER_QUERY = int(os.environ.get('SCRAPER_TICKERS_PER_QUERY', 10))
+# 'columnar+zlib' for the compact scraper response, 'json' for the legacy JSON-in-JSON body
+SCRAPER_WIRE_FORMAT = os.environ.get('SCRAPER_WIRE_FORMAT', 'columnar+zlib')
+# Reddit listings stop after about 1000 results
+REDDIT_SEARCH_MAX_RESULTS = 1000
 
-def connect_db():
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        conn.autocommit = True
-        return conn
-    except Exception as e:
-        print("Error connecting to the database:", e)
-        return None
+# Created on first use and reused across invocations of a warm container; boto3 clients are thread-safe
+lambda_client = None
+
+def get_lambda_client():
+    global lambda_client
+    if lambda_client is None:
+        import boto3
+        from botocore.config import Config
+        lambda_client = boto3.client('lambda', config=Config(max_pool_connections=max(SCRAPER_CONCURRENCY, 10)))
+    return lambda_client
+
+def post_row(post):
+    created_at = created_at_utc(post['created_utc'])
+    return (
+        post['id'],
+        post['ticker'],
+        post['subreddit'],
+        post['title'],
+        post['content'],
+        post['processed_content'],
+        post['score'],
+        created_at,
+        created_at.date()
+    )
 
-def store_in_db(conn, posts):
+def store_in_db(conn, posts, batch_size=DB_BATCH_SIZE):
+    totals = {'inserted': 0, 'updated': 0, 'expired': 0}
     try:
         cursor = conn.cursor()
         cursor.execute("SET search_path TO public;")
+        # Every row is returned, the ones claim_post_dates just claimed were inserted and the rest updated.
+        # ticker is never updated: the post's sentiment is counted in that ticker's buckets.
         insert_query = sql.SQL(""" 
             INSERT INTO reddit_posts (post_id, ticker, subreddit, title, content, processed_content, score, created_at, created_date)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (post_id) DO UPDATE SET
-            ticker = EXCLUDED.ticker,
+            VALUES %s
+            ON CONFLICT (post_id, created_date) DO UPDATE SET
             subreddit = EXCLUDED.subreddit,
             title = EXCLUDED.title,
             content = EXCLUDED.content,
             processed_content = EXCLUDED.processed_content,
+            sentiment = CASE
+                WHEN reddit_posts.processed_content IS DISTINCT FROM EXCLUDED.processed_content THEN NULL
+                ELSE reddit_posts.sentiment
+            END,
             score = EXCLUDED.score,
-            created_at = EXCLUDED.created_at,
-            created_date = EXCLUDED.created_date;
+            created_at = EXCLUDED.created_at
+            RETURNING post_id;
         """)
-        
-        for post in posts:
-            cursor.execute(insert_query, (
-                post['id'],
-                post['ticker'],
-                post['subreddit'],
-                post['title'],
-                post['content'],
-                post['processed_content'],
-                post['score'],
-                datetime.fromtimestamp(post['created_utc']),
-                datetime.fromtimestamp(post['created_utc']).date()
-            ))
+
+        # A multi-row upsert cannot touch the same post twice, so keep the last copy of each post_id.
+        # Posts stored before keep the created_date they were first stored under.
+        rows = list({post['id']: post_row(post) for post in posts}.values())
+        stored_dates, new_posts = claim_post_dates(cursor, {row[0]: row[-1] for row in rows})
+        rows = [row[:-1] + (stored_dates.get(row[0], row[-1]),) for row in rows]
+        cutoff = ensure_partitions(cursor, {row[-1] for row in rows})
+        if cutoff:
+            kept = [row for row in rows if row[-1] >= cutoff]
+            totals['expired'] = len(rows) - len(kept)
+            if totals['expired']:
+                print(f"Dropped {totals['expired']} posts from before the retention cutoff {cutoff}")
+            rows = kept
+
+        # One statement (and one transaction under autocommit) per batch
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            results = execute_values(cursor, insert_query, batch, page_size=len(batch), fetch=True)
+            inserted = sum(1 for (post_id,) in results if post_id in new_posts)
+            updated = len(results) - inserted
+            totals['inserted'] += inserted
+            totals['updated'] += updated
+            print(f"Batch {start // batch_size + 1}: {inserted} inserted, {updated} updated")
         
         cursor.close()
     except Exception as e:
         print("Error storing data in the database:", e)
+    return totals
 
-# Text preprocessing functions
-def make_lowercase(text):
-    return text.lower()
+# Built on the first request with preprocess enabled and kept for warm invocations
+preprocessor = None
 
-def remove_stopwords(text):
-    stop_words = set(stopwords.words('english'))
-    return " ".join([w for w in word_tokenize(re.sub(r'[^\w\s]', '', text)) if w not in stop_words])
+def get_preprocessor():
+    global preprocessor
+    if preprocessor is None:
+        preprocessor = Preprocessor()
+    return preprocessor
 
-def lemmatize_words(text):
-    lemmatizer = WordNetLemmatizer()
-    return " ".join([lemmatizer.lemmatize(word) for word in word_tokenize(text)])
+def preprocess_content(content):
+    return get_preprocessor().process(content)
 
-def clean_text(text):
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text)  # Remove URLs
-    text = re.sub(r'[^a-zA-Z\s]', '', text)  # Remove non-alphabetical characters
-    return text
+# High-water marks: the newest post already stored per (ticker, subreddit) as {pair: (created_utc, post_id)}
+def load_watermarks(conn, tickers, subreddits):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT ticker, subreddit, last_created_utc, last_post_id FROM scrape_watermarks
+        WHERE ticker = ANY(%s) AND subreddit = ANY(%s)
+    """, (list(tickers), list(subreddits)))
+    watermarks = {(ticker, subreddit): (created_utc, post_id) for ticker, subreddit, created_utc, post_id in cursor.fetchall()}
+    cursor.close()
+    return watermarks
 
-def preprocess_content(content):
-    content = make_lowercase(content)
-    content = remove_stopwords(content)
-    content = lemmatize_words(content)
-    content = clean_text(content)
-    return content
+# Only ever moves forward, a late or partial scrape cannot rewind it
+def save_watermark(conn, ticker, subreddit, posts):
+    newest = max(posts, key=lambda post: post['created_utc'])
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO scrape_watermarks (ticker, subreddit, last_created_utc, last_post_id, updated_at)
+        VALUES (%s, %s, %s, %s, now())
+        ON CONFLICT (ticker, subreddit) DO UPDATE SET
+        last_created_utc = EXCLUDED.last_created_utc,
+        last_post_id = EXCLUDED.last_post_id,
+        updated_at = EXCLUDED.updated_at
+        WHERE scrape_watermarks.last_created_utc < EXCLUDED.last_created_utc
+    """, (ticker, subreddit, newest['created_utc'], newest['id']))
+    cursor.close()
+
+# Posts stored per ticker over the last week, the scraper schedules busy tickers first
+def load_ticker_volumes(conn, tickers):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT ticker, COUNT(*) FROM reddit_posts
+        WHERE ticker = ANY(%s) AND created_date >= CURRENT_DATE - 7
+        GROUP BY ticker
+    """, (list(tickers),))
+    volumes = dict(cursor.fetchall())
+    cursor.close()
+    return volumes
+
+# One scraper invocation searches every subreddit for a group of tickers and
+# returns each post once, tagged with its subreddit and matching tickers
+def invoke_scraper(client, tickers, subreddits, limit, since=None, ticker_volumes=None):
+    payload = {
+        "tickers": tickers,
+        "subreddits": subreddits,
+        "limit": limit,
+        "format": SCRAPER_WIRE_FORMAT,
+        "fields": STORED_FIELDS
+    }
+    if since:
+        payload["since"] = since
+    if ticker_volumes:
+        payload["ticker_volumes"] = {ticker: ticker_volumes[ticker] for ticker in tickers if ticker in ticker_volumes}
+
+    result = client.invoke(
+        FunctionName='reddit_scraper_function',
+        InvocationType='RequestResponse',
+        Payload=json.dumps(payload)
+    )
+    
+    response_payload = json.loads(result['Payload'].read().decode())
+    
+    if 'errorMessage' in response_payload:
+        raise RuntimeError(f"Error fetching data: {response_payload['errorMessage']}")
+
+    # Compact responses are decoded straight from the payload, legacy ones carry a JSON string body
+    if 'encoding' in response_payload:
+        body = response_payload
+        posts = decode_posts(response_payload)
+    else:
+        body = json.loads(response_payload['body'])
+        posts = body['posts']
+
+    if body.get('failed_tickers'):
+        print(f"Scraper gave up on {', '.join(body['failed_tickers'])} after retries")
+    return posts
 
-def fetch_and_store(tickers, subreddits, preprocess_flag, limit=100):
+# Split a scraper result into per (ticker, subreddit) lists, dropping posts at or behind the pair's
+# watermark. A post mentioning several tickers goes to its primary ticker only, so it is stored once.
+def posts_by_pair(posts, watermarks):
+    pairs = {}
+    for post in posts:
+        ticker = primary_ticker(post_text(post['title'], post['content']), post['tickers'])
+        watermark = watermarks.get((ticker, post['subreddit']))
+        if watermark and (post['created_utc'] < watermark[0] or post['id'] == watermark[1]):
+            continue
+        pairs.setdefault((ticker, post['subreddit']), []).append(dict(post, ticker=ticker))
+    return pairs
+
+# Scraper invocations, preprocessing and DB writes run as overlapping pipeline stages with
+# tunable worker counts, connected by bounded queues. Returns per-stage stats.
+def fetch_and_store(tickers, subreddits, preprocess_flag, limit=100, batch_size=DB_BATCH_SIZE, concurrency=SCRAPER_CONCURRENCY,
+                    client=None, incremental=True, preprocess_workers=PREPROCESS_WORKERS, db_writers=DB_WRITERS, queue_size=PIPELINE_QUEUE_SIZE):
     conn = connect_db()
     if not conn:
         return
-    
-    for ticker in tickers:
-        query = f'"{ticker}"'
-        for subreddit in subreddits:
-            print(f"Fetching posts for {ticker} in r/{subreddit}...")
-            try:
-                client = boto3.client('lambda')
-                payload = {
-                    "query": query,
-                    "subreddit": subreddit,
-                    "limit": limit
-                }
-
-                result = client.invoke(
-                    FunctionName='reddit_scraper_function',
-                    InvocationType='RequestResponse',
-                    Payload=json.dumps(payload)
-                )
-                
-                response_payload = json.loads(result['Payload'].read().decode())
-                
-                if 'errorMessage' in response_payload:
-                    print(f"Error fetching data: {response_payload['errorMessage']}")
-                    continue
-
-                posts = json.loads(response_payload['body'])
-
-                print(f"Storing {len(posts)} posts in the database...")
-                
-                for post in posts:
-                    post['ticker'] = ticker
-                    post['subreddit'] = subreddit
-                    if preprocess_flag:
-                        post['processed_content'] = preprocess_content(post['content'])
-                    else:
-                        post['processed_content'] = None
-                
-                store_in_db(conn, posts)
-                
-            except Exception as e:
-                print(f"Error processing {ticker} in r/{subreddit}: {e}")
-    
-    conn.close()
+
+    client = client or get_lambda_client()
+
+    # Incremental scrapes stop paging at the newest post already stored for the pair
+    watermarks = {}
+    if incremental:
+        try:
+            watermarks = load_watermarks(conn, tickers, subreddits)
+        except Exception as e:
+            print("Error loading scrape watermarks, fetching everything:", e)
+
+    try:
+        ticker_volumes = load_ticker_volumes(conn, tickers)
+    except Exception as e:
+        print("Error loading ticker volumes:", e)
+        ticker_volumes = {}
+    release_db(conn)
+    tickers = sorted(tickers, key=lambda ticker: ticker_volumes.get(ticker, 0), reverse=True)
+
+    def scrape(ticker_group):
+        # A combined search can only stop at the oldest watermark of its pairs
+        group_watermarks = [watermarks.get((ticker, subreddit)) for ticker in ticker_group for subreddit in subreddits]
+        since = min(watermark[0] for watermark in group_watermarks) if all(group_watermarks) else None
+        group_limit = min(limit * len(group_watermarks), REDDIT_SEARCH_MAX_RESULTS)
+        print(f"Fetching posts for {', '.join(ticker_group)} in r/{'+'.join(subreddits)}...")
+        try:
+            return invoke_scraper(client, ticker_group, subreddits, group_limit, since, ticker_volumes) or None
+        except Exception as e:
+            raise RuntimeError(f"fetching {', '.join(ticker_group)} failed: {e}") from e
+
+    # Cross-posts between tickers are preprocessed once
+    def preprocess(posts):
+        if preprocess_flag:
+            processed = get_preprocessor().process_many([post['content'] for post in posts])
+        else:
+            processed = [None] * len(posts)
+        for post, processed_content in zip(posts, processed):
+            post['processed_content'] = processed_content
+        return posts
+
+    def store(posts):
+        writer_conn = connect_db()
+        if not writer_conn:
+            raise RuntimeError("Failed to connect to the database")
+        try:
+            for (ticker, subreddit), pair_posts in posts_by_pair(posts, watermarks).items():
+                try:
+                    print(f"Storing {len(pair_posts)} posts for {ticker} in r/{subreddit} in the database...")
+                    totals = store_in_db(writer_conn, pair_posts, batch_size)
+
+                    # Advance the watermark only once every post of the scrape is stored, or too old to keep
+                    if totals['inserted'] + totals['updated'] + totals['expired'] >= len({post['id'] for post in pair_posts}):
+                        save_watermark(writer_conn, ticker, subreddit, pair_posts)
+
+                except Exception as e:
+                    print(f"Error processing {ticker} in r/{subreddit}: {e}")
+        finally:
+            release_db(writer_conn)
+        return len(posts)
+
+    # Every writer holds a pooled connection while it stores a batch, the pool cannot hand out more
+    if db_writers > DB_POOL_SIZE:
+        print(f"Capping db_writers at DB_POOL_SIZE ({DB_POOL_SIZE})")
+        db_writers = DB_POOL_SIZE
+
+    # NLTK's lazily loaded corpora are not safe to load from several threads at once
+    if preprocess_flag:
+        get_preprocessor().process("warm up")
+
+    pipeline = StagedPipeline([
+        Stage('scrape', scrape, concurrency, queue_size),
+        Stage('preprocess', preprocess, preprocess_workers, queue_size),
+        Stage('store', store, db_writers, queue_size)
+    ])
+    ticker_groups = [tickers[start:start + SCRAPER_TICKERS_PER_QUERY] for start in range(0, len(tickers), SCRAPER_TICKERS_PER_QUERY)]
+    stats = pipeline.run(ticker_groups)
+    print("Pipeline:", json.dumps(stats))
+    return stats
 
 # AWS Lambda handler
 def lambda_handler(event, context):
@@ -153,6 +303,12 @@ def lambda_handler(event, context):
         subreddits = body.get('subreddits', [])
         preprocess_flag = body.get('preprocess', True)
         limit = body.get('limit', 100)
+        batch_size = body.get('batch_size', DB_BATCH_SIZE)
+        concurrency = body.get('concurrency', SCRAPER_CONCURRENCY)
+        incremental = body.get('incremental', True)
+        preprocess_workers = body.get('preprocess_workers', PREPROCESS_WORKERS)
+        db_writers = body.get('db_writers', DB_WRITERS)
+        queue_size = body.get('queue_size', PIPELINE_QUEUE_SIZE)
         
         if not tickers or not subreddits:
             return {
@@ -160,7 +316,8 @@ def lambda_handler(event, context):
                 "body": json.dumps({"error": "Tickers and subreddits are required"})
             }
         
-        fetch_and_store(tickers, subreddits, preprocess_flag, limit)
+        stats = fetch_and_store(tickers, subreddits, preprocess_flag, limit, batch_size, concurrency, incremental=incremental,
+                                preprocess_workers=preprocess_workers, db_writers=db_writers, queue_size=queue_size)
 
         return {
             "statusCode": 200,
@@ -168,7 +325,8 @@ def lambda_handler(event, context):
                 "message": "Lambda function executed successfully",
                 "tickers": tickers,
                 "subreddits": subreddits,
-                "limit": limit
+                "limit": limit,
+                "pipeline": stats
             })
         }
 
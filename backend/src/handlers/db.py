@@ -0,0 +1,71 @@
+import os
+import time
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from metrics import report_metric
+
+# Load environment variables
+DB_NAME = os.getenv('DB_NAME')
+DB_USER = os.getenv('DB_USER')
+DB_PASSWORD = os.getenv('DB_PASSWORD')
+DB_HOST = os.getenv('DB_HOST')
+DB_PORT = os.getenv('DB_PORT')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 4))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 60000))
+
+# Optional pgbouncer-style pooler in front of Postgres. Session pooling is required:
+# the local scripts' WITH HOLD cursors do not survive transaction pooling.
+DB_POOLER_HOST = os.getenv('DB_POOLER_HOST')
+DB_POOLER_PORT = os.getenv('DB_POOLER_PORT', DB_PORT)
+
+# Module level so warm Lambda invocations reuse open connections instead of reconnecting
+pool = None
+
+def get_pool():
+    global pool
+    if pool is None or pool.closed:
+        pool = ThreadedConnectionPool(
+            0,
+            DB_POOL_SIZE,
+            dbname=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            host=DB_POOLER_HOST or DB_HOST,
+            port=DB_POOLER_PORT if DB_POOLER_HOST else DB_PORT
+        )
+    return pool
+
+# Setting the statement timeout doubles as the health check, poolers drop startup options
+def checkout(autocommit):
+    conn = get_pool().getconn()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("SET statement_timeout = %s", (DB_STATEMENT_TIMEOUT_MS,))
+        conn.autocommit = autocommit
+        return conn
+    except psycopg2.Error as e:
+        print("Discarding broken database connection:", e)
+        get_pool().putconn(conn, close=True)
+        return None
+
+def connect_db(autocommit=True):
+    start = time.perf_counter()
+    try:
+        # A stale connection is replaced by a fresh one once
+        conn = checkout(autocommit) or checkout(autocommit)
+        if conn:
+            report_metric('DBConnectionAcquireTime', round((time.perf_counter() - start) * 1000, 2))
+        return conn
+    except Exception as e:
+        print("Error connecting to the database:", e)
+        return None
+
+# Return a connection to the pool instead of closing it
+def release_db(conn):
+    if pool is None or pool.closed:
+        conn.close()
+        return
+    if not conn.closed and not conn.autocommit:
+        conn.rollback()
+    pool.putconn(conn, close=bool(conn.closed))
@@ -0,0 +1,25 @@
+import json
+import os
+import time
+
+METRICS_NAMESPACE = os.getenv('METRICS_NAMESPACE', 'StockSentiment')
+# Only Lambda's log stream turns the lines into metrics, local scripts stay quiet unless
+# METRICS_ENABLED=1
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1' if os.getenv('AWS_LAMBDA_FUNCTION_NAME') else '0') == '1'
+
+# Print a metric in CloudWatch embedded metric format, Lambda's log stream turns it into a metric
+def report_metric(name, value, unit='Milliseconds', **dimensions):
+    if not METRICS_ENABLED:
+        return
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [list(dimensions)],
+                "Metrics": [{"Name": name, "Unit": unit}]
+            }]
+        },
+        name: value,
+        **dimensions
+    }))
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from queue import Queue
+
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 4))
+
+# Marks the end of a stage's input, one per worker
+DONE = object()
+
+# One step of a StagedPipeline: `workers` threads apply fn to the items of a bounded input
+# queue. fn returns the item for the next stage, or None to drop it. A full queue blocks the
+# stage feeding it, so a slow stage throttles everything upstream instead of buffering.
+class Stage:
+    def __init__(self, name, fn, workers=1, queue_size=PIPELINE_QUEUE_SIZE):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue = Queue(maxsize=max(1, queue_size))
+        self.lock = threading.Lock()
+        self.counters = {
+            'items_in': 0, 'items_out': 0, 'errors': 0,
+            'busy_seconds': 0.0, 'idle_seconds': 0.0, 'blocked_seconds': 0.0,
+            'max_queue_depth': 0, 'queue_depth_total': 0, 'queue_samples': 0
+        }
+
+    def count(self, **values):
+        with self.lock:
+            for name, value in values.items():
+                self.counters[name] += value
+
+    # Enqueue an item, recording how full the queue was and how long the producer waited
+    def put(self, item, producer=None):
+        depth = self.queue.qsize()
+        with self.lock:
+            self.counters['max_queue_depth'] = max(self.counters['max_queue_depth'], depth)
+        self.count(queue_depth_total=depth, queue_samples=1)
+        start = time.perf_counter()
+        self.queue.put(item)
+        if producer:
+            producer.count(blocked_seconds=time.perf_counter() - start)
+
+    def stats(self, elapsed):
+        with self.lock:
+            counters = dict(self.counters)
+        samples = counters.pop('queue_samples')
+        depth_total = counters.pop('queue_depth_total')
+        busy = counters['busy_seconds']
+        return dict(
+            counters,
+            workers=self.workers,
+            busy_seconds=round(busy, 3),
+            idle_seconds=round(counters['idle_seconds'], 3),
+            blocked_seconds=round(counters['blocked_seconds'], 3),
+            # Share of the stage's worker time spent working, near 1.0 marks the bottleneck
+            utilization=round(busy / (elapsed * self.workers), 3) if elapsed else 0,
+            items_per_second=round(counters['items_in'] / elapsed, 2) if elapsed else 0,
+            avg_queue_depth=round(depth_total / samples, 2) if samples else 0
+        )
+
+# Producer/consumer pipeline of Stages connected by bounded queues, so scraping, CPU work and
+# DB writes overlap. Errors in fn are counted and printed, and the item is dropped.
+class StagedPipeline:
+    def __init__(self, stages):
+        self.stages = stages
+        self.elapsed = 0.0
+
+    def worker(self, index):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            start = time.perf_counter()
+            item = stage.queue.get()
+            stage.count(idle_seconds=time.perf_counter() - start)
+            if item is DONE:
+                return
+            stage.count(items_in=1)
+
+            start = time.perf_counter()
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                stage.count(errors=1)
+                print(f"Error in {stage.name} stage:", e)
+                result = None
+            stage.count(busy_seconds=time.perf_counter() - start)
+
+            if result is not None:
+                stage.count(items_out=1)
+                if next_stage:
+                    next_stage.put(result, stage)
+
+    # Feed items into the first stage and wait until every stage has drained
+    def run(self, items):
+        start = time.perf_counter()
+        threads = []
+        for index, stage in enumerate(self.stages):
+            stage_threads = [threading.Thread(target=self.worker, args=(index,), daemon=True) for _ in range(stage.workers)]
+            for thread in stage_threads:
+                thread.start()
+            threads.append(stage_threads)
+
+        for item in items:
+            self.stages[0].put(item)
+
+        # Shut stages down in order: a stage only finishes once everything upstream has
+        for stage, stage_threads in zip(self.stages, threads):
+            for _ in stage_threads:
+                stage.queue.put(DONE)
+            for thread in stage_threads:
+                thread.join()
+
+        self.elapsed = time.perf_counter() - start
+        return self.stats()
+
+    def stats(self):
+        return {stage.name: stage.stats(self.elapsed) for stage in self.stages}
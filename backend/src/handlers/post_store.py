@@ -0,0 +1,32 @@
+from datetime import datetime, timezone
+from psycopg2.extras import execute_values
+
+# Reddit timestamps are UTC seconds. Dates are taken in UTC as well, whatever the timezone of
+# the host, so every writer files a post under the same created_date.
+def created_at_utc(created_utc):
+    return datetime.fromtimestamp(float(created_utc), timezone.utc)
+
+# reddit_posts is partitioned by month of created_date. Create the partitions for the given
+# dates and return the retention cutoff, posts dated before it have no partition to go to.
+# Nothing is cached between batches: archive_partitions.py can move the cutoff and drop
+# months at any time, and one call per batch is cheap next to the upsert.
+def ensure_partitions(cursor, dates):
+    months = sorted({created_date.replace(day=1) for created_date in dates})
+    cursor.execute("SELECT ensure_reddit_posts_partitions(%s::date[])", (months,))
+    return cursor.fetchone()[0]
+
+# Record the created_date of posts not seen before in reddit_post_ids. Returns
+# {post_id: created_date} with the date each post is stored under, which for a post seen
+# before is the one it was first stored with, and the set of post_ids claimed just now.
+# Postgres cannot return xmax from a partitioned table, so writers count a post as inserted
+# when this call claimed it.
+def claim_post_dates(cursor, post_dates):
+    if not post_dates:
+        return {}, set()
+    claimed = execute_values(cursor, """
+        INSERT INTO reddit_post_ids (post_id, created_date) VALUES %s
+        ON CONFLICT (post_id) DO NOTHING
+        RETURNING post_id
+    """, list(post_dates.items()), page_size=len(post_dates), fetch=True)
+    cursor.execute("SELECT post_id, created_date FROM reddit_post_ids WHERE post_id = ANY(%s)", (list(post_dates),))
+    return dict(cursor.fetchall()), {post_id for (post_id,) in claimed}
@@ -0,0 +1,27 @@
+import re
+from functools import lru_cache
+
+# Text preprocessing: lowercase, strip punctuation, drop stopwords, lemmatize, then remove URLs
+# and non-alphabetical characters. NLTK resources and regexes are loaded once per Preprocessor.
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+URL_PATTERN = re.compile(r'http\S+|www\S+|https\S+')
+NON_ALPHA_PATTERN = re.compile(r'[^a-zA-Z\s]')
+
+class Preprocessor:
+    def __init__(self, lemma_cache_size=50000):
+        # nltk is only imported once a request actually preprocesses
+        from nltk.corpus import stopwords
+        from nltk.stem import WordNetLemmatizer
+        from nltk.tokenize import word_tokenize
+
+        self.stop_words = frozenset(stopwords.words('english'))
+        self.lemmatize = lru_cache(maxsize=lemma_cache_size)(WordNetLemmatizer().lemmatize)
+        self.tokenize = word_tokenize
+
+    def process(self, text):
+        words = self.tokenize(PUNCTUATION_PATTERN.sub('', text.lower()))
+        lemmas = [self.lemmatize(word) for word in words if word not in self.stop_words]
+        return " ".join(NON_ALPHA_PATTERN.sub('', URL_PATTERN.sub('', lemma)) for lemma in lemmas)
+
+    def process_many(self, texts):
+        return [self.process(text) for text in texts]
@@ -0,0 +1,145 @@
+import os
+import random
+import threading
+import time
+from queue import PriorityQueue, Empty
+
+# Reddit allows 100 OAuth requests per minute per client
+REDDIT_REQUESTS_PER_MINUTE = float(os.getenv('REDDIT_REQUESTS_PER_MINUTE', 100))
+REDDIT_WORKERS = int(os.getenv('REDDIT_WORKERS', 4))
+REDDIT_MAX_RETRIES = int(os.getenv('REDDIT_MAX_RETRIES', 5))
+REDDIT_BACKOFF_BASE = float(os.getenv('REDDIT_BACKOFF_BASE', 1.0))
+REDDIT_BACKOFF_CAP = float(os.getenv('REDDIT_BACKOFF_CAP', 60.0))
+
+# Token bucket refilled at the per-minute rate. Reddit's x-ratelimit-remaining/-reset headers
+# override the local estimate: tokens never exceed what Reddit says is left, and an exhausted
+# quota blocks every caller until the reset.
+class TokenBucket:
+    def __init__(self, requests_per_minute=REDDIT_REQUESTS_PER_MINUTE, burst=None):
+        self.rate = requests_per_minute / 60
+        self.capacity = burst or max(1.0, requests_per_minute / 10)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Block until `cost` tokens are available, returns the seconds spent waiting
+    def acquire(self, cost=1):
+        cost = min(cost, self.capacity)
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+                delay = self.blocked_until - now
+                if delay <= 0:
+                    if self.tokens >= cost:
+                        self.tokens -= cost
+                        return waited
+                    delay = (cost - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def update_quota(self, remaining, reset_in):
+        with self.lock:
+            now = time.monotonic()
+            self.refill(now)
+            if remaining is not None:
+                self.tokens = min(self.tokens, remaining)
+                if remaining < 1 and reset_in:
+                    self.blocked_until = max(self.blocked_until, now + reset_in)
+
+    def block_for(self, seconds):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+# Runs Reddit calls on a pool of worker threads that share one TokenBucket. Jobs with a higher
+# priority (e.g. tickers with more posts) are started first; calls failing with one of
+# `retry_on` are retried with full-jitter exponential backoff. `quota` returns Reddit's last
+# seen (remaining, reset_in_seconds) after each call.
+class RateLimitScheduler:
+    def __init__(self, bucket=None, quota=None, retry_on=(), throttle_on=(), workers=REDDIT_WORKERS, max_retries=REDDIT_MAX_RETRIES):
+        self.bucket = bucket or TokenBucket()
+        self.quota = quota
+        self.retry_on = tuple(retry_on) + tuple(throttle_on)
+        self.throttle_on = tuple(throttle_on)
+        self.workers = workers
+        self.max_retries = max_retries
+        # Jobs queued by every run() in progress but not started yet
+        self.queued = 0
+        self.stats_lock = threading.Lock()
+        self.counters = {'requests': 0, 'throttles': 0, 'retries': 0, 'failures': 0, 'wait_seconds': 0.0, 'max_queue_depth': 0}
+
+    def count(self, name, value=1):
+        with self.stats_lock:
+            self.counters[name] += value
+
+    def sync_quota(self):
+        if self.quota:
+            remaining, reset_in = self.quota()
+            self.bucket.update_quota(remaining, reset_in)
+
+    # Call fn once `cost` request tokens are available, retrying retryable failures
+    def call(self, fn, cost=1):
+        for attempt in range(self.max_retries + 1):
+            self.count('wait_seconds', self.bucket.acquire(cost))
+            self.count('requests')
+            try:
+                result = fn()
+                self.sync_quota()
+                return result
+            except self.retry_on as e:
+                self.sync_quota()
+                backoff = random.uniform(0, min(REDDIT_BACKOFF_CAP, REDDIT_BACKOFF_BASE * 2 ** attempt))
+                if isinstance(e, self.throttle_on):
+                    self.count('throttles')
+                    self.bucket.block_for(backoff)
+                if attempt == self.max_retries:
+                    self.count('failures')
+                    raise
+                self.count('retries')
+                time.sleep(backoff)
+            except Exception:
+                self.count('failures')
+                raise
+
+    # jobs: (priority, cost, fn) tuples. Returns (result, error) per job, in job order. Each call
+    # gets its own queue, so concurrent runs never take each other's jobs. The job's sequence
+    # number breaks priority ties, so the functions themselves are never compared.
+    def run(self, jobs):
+        jobs = list(jobs)
+        outcomes = [(None, None)] * len(jobs)
+        queue = PriorityQueue()
+        for sequence, (priority, cost, fn) in enumerate(jobs):
+            queue.put((-priority, sequence, cost, fn))
+        with self.stats_lock:
+            self.queued += len(jobs)
+            self.counters['max_queue_depth'] = max(self.counters['max_queue_depth'], self.queued)
+
+        def worker():
+            while True:
+                try:
+                    _, index, cost, fn = queue.get_nowait()
+                except Empty:
+                    return
+                with self.stats_lock:
+                    self.queued -= 1
+                try:
+                    outcomes[index] = (self.call(fn, cost), None)
+                except Exception as e:
+                    outcomes[index] = (None, e)
+
+        threads = [threading.Thread(target=worker) for _ in range(min(self.workers, len(jobs)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def stats(self):
+        with self.stats_lock:
+            return dict(self.counters, queue_depth=self.queued, wait_seconds=round(self.counters['wait_seconds'], 3))
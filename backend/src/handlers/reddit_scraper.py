@@ -1,19 +1,52 @@
 import praw
+import prawcore
 import json
+import math
 import os
+import time
 from datetime import datetime
+from functools import partial
+from rate_limit import RateLimitScheduler, TokenBucket
+from tickers import mentioned_tickers, post_text
+from wire_format import COLUMNAR_ZLIB, STORED_FIELDS, encode_posts
 
 # Load Reddit API credentials from Lambda environment variables
 client_id = os.environ['REDDIT_CLIENT_ID']
 client_secret = os.environ['REDDIT_CLIENT_SECRET']
 user_agent = os.environ['REDDIT_USER_AGENT']
+REDDIT_TICKERS_PER_QUERY = int(os.getenv('REDDIT_TICKERS_PER_QUERY', 5))
 
-reddit = praw.Reddit(client_id=client_id, client_secret=client_secret, user_agent=user_agent)
+# Optional endpoint overrides, e.g. to run against a local fake Reddit server
+reddit_urls = {key: os.environ[env] for key, env in (('oauth_url', 'REDDIT_OAUTH_URL'), ('reddit_url', 'REDDIT_URL')) if os.getenv(env)}
 
-def get_posts(subreddit_name, query, limit):
+reddit = praw.Reddit(client_id=client_id, client_secret=client_secret, user_agent=user_agent, **reddit_urls)
+
+# Reddit's quota as last reported in the x-ratelimit-* headers, as (remaining, seconds until reset)
+def reddit_quota():
+    limits = reddit.auth.limits
+    reset_timestamp = limits.get('reset_timestamp')
+    return limits.get('remaining'), reset_timestamp - time.time() if reset_timestamp else None
+
+# Shared by all scraper threads and kept across warm invocations
+scheduler = RateLimitScheduler(
+    TokenBucket(),
+    quota=reddit_quota,
+    retry_on=(prawcore.exceptions.ServerError, prawcore.exceptions.RequestException),
+    throttle_on=(prawcore.exceptions.TooManyRequests,)
+)
+
+# Listing pages are 100 posts, each page is one request against the quota
+def search_cost(limit):
+    return max(1, math.ceil(limit / 100))
+
+# Results are newest first, so paging stops at the high-water mark post (since_id) or at
+# the first post older than its created_utc (since)
+def get_posts(subreddit_name, query, limit, since=None, since_id=None):
     posts_list = []
     subreddit = reddit.subreddit(subreddit_name)
     for post in subreddit.search(query, sort='new', limit=limit):
+        if since is not None and (post.id == since_id or post.created_utc < since):
+            break
         posts_list.append({
             'id': post.id,
             'title': post.title,
@@ -25,6 +58,73 @@ def get_posts(subreddit_name, query, limit):
         })
     return posts_list
 
+# One search over r/a+b+c for '"T1" OR "T2"'. Each post is attributed locally to the requested
+# subreddit it came from and to the tickers its title or body mentions; a post is returned once
+# with all its tickers, earliest mentioned first. With a single ticker every result belongs to it, otherwise posts that
+# matched only through fields we do not see (flair, url) are counted as unattributed.
+def get_posts_multi(subreddit_names, tickers, limit, since=None):
+    requested_subreddits = {name.lower(): name for name in subreddit_names}
+    query = " OR ".join(f'"{ticker}"' for ticker in tickers)
+
+    posts_list = []
+    unattributed = 0
+    subreddit = reddit.subreddit("+".join(subreddit_names))
+    for post in subreddit.search(query, sort='new', limit=limit):
+        if since is not None and post.created_utc < since:
+            break
+
+        matched_tickers = mentioned_tickers(post_text(post.title, post.selftext), tickers)
+        if not matched_tickers and len(tickers) == 1:
+            matched_tickers = list(tickers)
+        subreddit_name = requested_subreddits.get(post.subreddit.display_name.lower())
+        if not matched_tickers or not subreddit_name:
+            unattributed += 1
+            continue
+
+        posts_list.append({
+            'id': post.id,
+            'title': post.title,
+            'content': post.selftext,
+            'score': post.score,
+            'created_utc': post.created_utc,
+            'url': post.url,
+            'num_comments': post.num_comments,
+            'subreddit': subreddit_name,
+            'tickers': matched_tickers
+        })
+    return posts_list, unattributed
+
+# Split the tickers into OR'ed queries run concurrently through the scheduler, highest volume
+# tickers first, and merge the results so each post appears once with all its tickers.
+# Returns the merged posts, the unattributed count and the tickers whose query failed.
+def get_posts_scheduled(subreddit_names, tickers, limit, since=None, ticker_volumes=None):
+    ticker_volumes = ticker_volumes or {}
+    tickers = sorted(tickers, key=lambda ticker: ticker_volumes.get(ticker, 0), reverse=True)
+    groups = [tickers[start:start + REDDIT_TICKERS_PER_QUERY] for start in range(0, len(tickers), REDDIT_TICKERS_PER_QUERY)]
+
+    jobs = []
+    for group in groups:
+        group_limit = math.ceil(limit * len(group) / len(tickers))
+        priority = sum(ticker_volumes.get(ticker, 0) for ticker in group)
+        jobs.append((priority, search_cost(group_limit), partial(get_posts_multi, subreddit_names, group, group_limit, since)))
+
+    posts_by_id = {}
+    unattributed = 0
+    failed_tickers = []
+    for group, (outcome, error) in zip(groups, scheduler.run(jobs)):
+        if error:
+            print(f"Error fetching {', '.join(group)}: {error}")
+            failed_tickers += group
+            continue
+        group_posts, group_unattributed = outcome
+        unattributed += group_unattributed
+        for post in group_posts:
+            if post['id'] in posts_by_id:
+                posts_by_id[post['id']]['tickers'] += [ticker for ticker in post['tickers'] if ticker not in posts_by_id[post['id']]['tickers']]
+            else:
+                posts_by_id[post['id']] = post
+    return list(posts_by_id.values()), unattributed, failed_tickers
+
 def lambda_handler(event, context):
     try:
         if 'body' in event:
@@ -32,9 +132,42 @@ def lambda_handler(event, context):
         else:
             body = event
 
+        limit = body.get('limit', 100)
+        since = body.get('since')
+
+        # Multi-subreddit, multi-ticker form: {"subreddits": [...], "tickers": [...]}
+        if 'subreddits' in body or 'tickers' in body:
+            subreddit_names = body.get('subreddits') or []
+            tickers = body.get('tickers') or []
+            if not subreddit_names or not tickers:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': 'subreddits and tickers must be non-empty lists'})
+                }
+
+            new_posts, unattributed, failed_tickers = get_posts_scheduled(subreddit_names, tickers, limit, since, body.get('ticker_volumes'))
+
+            print(f"Fetched {len(new_posts)} posts for {len(tickers)} tickers from r/{'+'.join(subreddit_names)} ({unattributed} unattributed)")
+            print("Scheduler:", scheduler.stats())
+
+            # Compact responses carry the encoded posts at the top level, so the collector decodes once
+            if body.get('format') == COLUMNAR_ZLIB:
+                return {
+                    'statusCode': 200,
+                    **encode_posts(new_posts, body.get('fields') or STORED_FIELDS),
+                    'unattributed': unattributed,
+                    'failed_tickers': failed_tickers,
+                    'scheduler': scheduler.stats()
+                }
+
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'posts': new_posts, 'unattributed': unattributed, 'failed_tickers': failed_tickers, 'scheduler': scheduler.stats()})
+            }
+
         subreddit_name = body.get('subreddit')
         query = body.get('query')
-        limit = body.get('limit', 100)
+        since_id = body.get('since_id')
 
         if not subreddit_name or not query:
             return {
@@ -42,7 +175,7 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': 'subreddit and query are required parameters'})
             }
 
-        new_posts = get_posts(subreddit_name, query, limit)
+        new_posts = scheduler.call(partial(get_posts, subreddit_name, query, limit, since, since_id), search_cost(limit))
 
         print(f"Fetched {len(new_posts)} posts from r/{subreddit_name}")
 
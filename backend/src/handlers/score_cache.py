@@ -0,0 +1,83 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+# Lambda only allows writes under /tmp, which survives across warm invocations
+SCORE_CACHE_PATH = os.getenv('SCORE_CACHE_PATH', '/tmp/sentiment_scores.sqlite3')
+SCORE_CACHE_MAX_ENTRIES = int(os.getenv('SCORE_CACHE_MAX_ENTRIES', 500000))
+
+# SQLite caps the number of bound parameters per statement
+QUERY_CHUNK_SIZE = 500
+
+def content_key(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+# Persistent sentiment scores keyed by a hash of the scored text. Every entry is tagged with the
+# analyzer version and only entries of this version are read back. Entries from any other
+# version are dropped when the cache is opened, but another process sharing the file with a
+# different version can write them again later.
+class ScoreCache:
+    def __init__(self, version, path=SCORE_CACHE_PATH, max_entries=SCORE_CACHE_MAX_ENTRIES):
+        self.version = version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scores (
+                key BLOB PRIMARY KEY,
+                version TEXT NOT NULL,
+                score REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS scores_used_at_idx ON scores (used_at)")
+        self.conn.execute("DELETE FROM scores WHERE version != ?", (version,))
+        self.conn.commit()
+        # Counted once here and tracked on writes, so eviction does not scan the table. Scores
+        # replaced in place are counted as new, which can only evict a little early.
+        (self.entries,) = self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()
+
+    # Cached scores for the given texts as {text: score}, refreshing the hits' last use
+    def get_many(self, texts):
+        keys = {content_key(text): text for text in texts}
+        found = {}
+        key_list = list(keys)
+        for start in range(0, len(key_list), QUERY_CHUNK_SIZE):
+            chunk = key_list[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            for key, score in self.conn.execute(f"SELECT key, score FROM scores WHERE key IN ({placeholders}) AND version = ?", chunk + [self.version]):
+                found[keys[key]] = score
+
+        now = time.time()
+        self.conn.executemany("UPDATE scores SET used_at = ? WHERE key = ?", [(now, content_key(text)) for text in found])
+        self.conn.commit()
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, scores):
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO scores (key, version, score, used_at) VALUES (?, ?, ?, ?)",
+            [(content_key(text), self.version, score, now) for text, score in scores.items()]
+        )
+        self.entries += len(scores)
+        self.evict()
+        self.conn.commit()
+
+    # Keep at most max_entries rows, dropping the least recently used first
+    def evict(self):
+        overflow = self.entries - self.max_entries
+        if overflow > 0:
+            self.conn.execute("DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY used_at LIMIT ?)", (overflow,))
+            self.evictions += overflow
+            self.entries = self.max_entries
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def close(self):
+        self.conn.close()
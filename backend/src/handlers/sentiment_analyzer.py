@@ -1,129 +1,296 @@
-import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
 from datetime import datetime
+from functools import lru_cache
+import hashlib
+from importlib.metadata import version
+import numpy as np
+import pandas as pd
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 import json
 import os
+from db import connect_db, release_db
+from score_cache import ScoreCache
 
 # Environment Variables
-DB_NAME = os.getenv('DB_NAME')
-DB_USER = os.getenv('DB_USER')
-DB_PASSWORD = os.getenv('DB_PASSWORD')
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT')
+DB_BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', 500))
+SENTIMENT_CACHE_SIZE = int(os.getenv('SENTIMENT_CACHE_SIZE', 10000))
+
+# Held for the whole run, so only one analyzer updates the running sums at a time
+ANALYZER_LOCK_ID = 20250302
 
 # Sentiment Analyzer
 analyzer = SentimentIntensityAnalyzer()
 
-def connect_db():
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        conn.autocommit = True
-        return conn
-    except Exception as e:
-        print("Error connecting to the database:", e)
-        return None
+# Cached scores are only valid for the analyzer that produced them. SENTIMENT_MODEL_VERSION is a
+# manual bump; the package version and lexicon digest change on their own when VADER is upgraded.
+lexicon_digest = hashlib.md5(repr(sorted(analyzer.lexicon.items())).encode()).hexdigest()[:12]
+ANALYZER_VERSION = f"{os.getenv('SENTIMENT_MODEL_VERSION', '1')}:vader-{version('vaderSentiment')}:{lexicon_digest}"
+
+# Opened on first use and kept for later warm invocations
+score_cache = None
+
+def get_score_cache():
+    global score_cache
+    if score_cache is None:
+        try:
+            score_cache = ScoreCache(ANALYZER_VERSION)
+        except Exception as e:
+            print("Error opening the score cache, scoring without it:", e)
+    return score_cache
 
+# Cross-posts show up under several tickers and subreddits, so identical texts are scored once
+@lru_cache(maxsize=SENTIMENT_CACHE_SIZE)
 def calculate_sentiment(text):
     score = analyzer.polarity_scores(text)
     return score['compound']
 
-def analyze_sentiment(conn, tickers, subreddits):
+# Compound scores for a batch of texts. Duplicates within the batch are looked up once and
+# texts already in the persistent cache are not scored again.
+def score_batch(texts, cache=None):
+    codes, unique_texts = pd.factorize(pd.Series(texts, dtype=object))
+    cached = cache.get_many(unique_texts) if cache else {}
+    scored = {text: calculate_sentiment(text) for text in unique_texts if text not in cached}
+    if cache and scored:
+        cache.put_many(scored)
+    scores = np.fromiter((cached[text] if text in cached else scored[text] for text in unique_texts), dtype=float, count=len(unique_texts))
+    return scores[codes]
+
+# Write a batch of (id, created_date, sentiment, weighted_sentiment) rows back in one statement,
+# created_date prunes each row's update to its month's partition
+def flush_sentiment_updates(cursor, updates):
+    if not updates:
+        return
+    execute_values(cursor, """
+        UPDATE reddit_posts AS p
+        SET sentiment = v.sentiment, weighted_sentiment = v.weighted_sentiment
+        FROM (VALUES %s) AS v(id, created_date, sentiment, weighted_sentiment)
+        WHERE p.id = v.id AND p.created_date = v.created_date
+    """, updates, page_size=len(updates))
+    updates.clear()
+
+# ON CONFLICT clause shared by every table that keeps sentiment as sentiment_sum / sample_size.
+# A full rebuild overwrites the row, an incremental run adds its deltas to the running sums.
+def running_sum_update(table, timestamp_column, full_rebuild=False):
+    if full_rebuild:
+        return f"""
+            sentiment_sum = EXCLUDED.sentiment_sum,
+            sample_size = EXCLUDED.sample_size,
+            sentiment = EXCLUDED.sentiment,
+            {timestamp_column} = EXCLUDED.{timestamp_column}
+        """
+    return f"""
+        sentiment_sum = {table}.sentiment_sum + EXCLUDED.sentiment_sum,
+        sample_size = {table}.sample_size + EXCLUDED.sample_size,
+        sentiment = COALESCE(({table}.sentiment_sum + EXCLUDED.sentiment_sum)
+            / NULLIF({table}.sample_size + EXCLUDED.sample_size, 0), 0),
+        {timestamp_column} = EXCLUDED.{timestamp_column}
+    """
+
+# Upsert every (ticker, subreddit, date) bucket of a run in one statement
+def upsert_ticker_sentiment(cursor, rows, full_rebuild=False, page_size=DB_BATCH_SIZE):
+    if not rows:
+        return
+    execute_values(cursor, """
+        INSERT INTO ticker_sentiment (id, ticker, subreddit, sentiment, sentiment_sum, sample_size, calculated_at, date)
+        VALUES %s
+        ON CONFLICT (id, date) DO UPDATE SET
+    """ + running_sum_update('ticker_sentiment', 'calculated_at', full_rebuild), rows, page_size=page_size)
+
+# Daily, weekly (starting Monday) and monthly series per (ticker, subreddit) for the dashboard API.
+# Only the periods containing a changed bucket are written.
+def upsert_sentiment_rollups(cursor, totals, calculated_at, full_rebuild=False, page_size=DB_BATCH_SIZE):
+    buckets = totals.reset_index()
+    buckets = buckets[buckets['created_date'].notna()]
+    if buckets.empty:
+        return
+    dates = pd.to_datetime(buckets['created_date'])
+    period_starts = {
+        'day': dates.dt.date,
+        'week': dates.dt.to_period('W-SUN').dt.start_time.dt.date,
+        'month': dates.dt.to_period('M').dt.start_time.dt.date
+    }
+
+    rows = []
+    for period, starts in period_starts.items():
+        grouped = buckets.assign(period_start=starts).groupby(['ticker', 'subreddit', 'period_start'])[['sentiment_delta', 'posts_delta']].sum()
+        for (ticker, subreddit, period_start), total_sentiment, total_posts in zip(grouped.index, grouped['sentiment_delta'], grouped['posts_delta']):
+            avg_sentiment = total_sentiment / total_posts if total_posts > 0 else 0
+            rows.append((ticker, subreddit, period, period_start, float(avg_sentiment), float(total_sentiment), int(total_posts), calculated_at))
+
+    execute_values(cursor, """
+        INSERT INTO sentiment_rollups (ticker, subreddit, period, period_start, sentiment, sentiment_sum, sample_size, updated_at)
+        VALUES %s
+        ON CONFLICT (ticker, subreddit, period, period_start) DO UPDATE SET
+    """ + running_sum_update('sentiment_rollups', 'updated_at', full_rebuild), rows, page_size=page_size)
+
+# Catalog of the (ticker, subreddit) pairs that have sentiment, with their date range
+def upsert_sentiment_catalog(cursor, totals, calculated_at, full_rebuild=False):
+    buckets = totals.reset_index()
+    buckets = buckets[buckets['created_date'].notna()]
+    if buckets.empty:
+        return
+    grouped = buckets.groupby(['ticker', 'subreddit']).agg(
+        first_date=('created_date', 'min'),
+        last_date=('created_date', 'max'),
+        sample_size=('posts_delta', 'sum')
+    )
+    rows = [
+        (ticker, subreddit, first_date, last_date, int(sample_size), calculated_at)
+        for (ticker, subreddit), first_date, last_date, sample_size in zip(grouped.index, grouped['first_date'], grouped['last_date'], grouped['sample_size'])
+    ]
+    if full_rebuild:
+        conflict_update = """
+            first_date = EXCLUDED.first_date,
+            last_date = EXCLUDED.last_date,
+            sample_size = EXCLUDED.sample_size,
+            updated_at = EXCLUDED.updated_at
+        """
+    else:
+        conflict_update = """
+            first_date = LEAST(sentiment_catalog.first_date, EXCLUDED.first_date),
+            last_date = GREATEST(sentiment_catalog.last_date, EXCLUDED.last_date),
+            sample_size = sentiment_catalog.sample_size + EXCLUDED.sample_size,
+            updated_at = EXCLUDED.updated_at
+        """
+    execute_values(cursor, """
+        INSERT INTO sentiment_catalog (ticker, subreddit, first_date, last_date, sample_size, updated_at)
+        VALUES %s
+        ON CONFLICT (ticker, subreddit) DO UPDATE SET
+    """ + conflict_update, rows)
+
+# Bump the version stamp read by the dashboard API and notify its listeners, so cached
+# responses are dropped as soon as the run's writes are visible
+def bump_sentiment_version(cursor):
+    cursor.execute("""
+        UPDATE sentiment_version SET version = version + 1, updated_at = now()
+        RETURNING version
+    """)
+    row = cursor.fetchone()
+    if row:
+        cursor.execute("SELECT pg_notify('sentiment_updated', %s)", (str(row[0]),))
+        return row[0]
+
+POST_COLUMNS = ['id', 'ticker', 'subreddit', 'content', 'score', 'created_date', 'previous_weighted']
+BUCKET_KEYS = ['ticker', 'subreddit', 'created_date']
+
+def bucket_rows(totals, calculated_at):
+    rows = []
+    for (ticker, subreddit, created_date), total_sentiment, total_posts in zip(totals.index, totals['sentiment_delta'], totals['posts_delta']):
+        created_date = None if pd.isna(created_date) else created_date
+        avg_sentiment = total_sentiment / total_posts if total_posts > 0 else 0
+        rows.append((f"{ticker}_{subreddit}", ticker, subreddit, float(avg_sentiment), float(total_sentiment), int(total_posts), calculated_at, created_date))
+    return rows
+
+# Stream every requested (ticker, subreddit) pair from one query through a server-side cursor,
+# yielding batch_size rows at a time. The cursor lives inside the run's transaction.
+# since_date limits the scan to the partitions from that month on.
+def fetch_posts(conn, tickers, subreddits, batch_size=DB_BATCH_SIZE, full_rebuild=False, since_date=None):
+    unscored_filter = "" if full_rebuild else "AND sentiment IS NULL"
+    date_filter = "AND created_date >= %s" if since_date else ""
+    params = (list(tickers), list(subreddits)) + ((since_date,) if since_date else ())
+    cursor = conn.cursor(name='analyze_sentiment_posts')
+    try:
+        cursor.execute(sql.SQL("""
+            SELECT id, ticker, subreddit, processed_content, score, created_date, weighted_sentiment FROM reddit_posts
+            WHERE ticker = ANY(%s) AND subreddit = ANY(%s) AND processed_content IS NOT NULL
+        """ + unscored_filter + " " + date_filter), params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+# Score one batch of posts, write the scores back and return its per-bucket deltas.
+# Incremental runs contribute the change in weighted sentiment and only count posts new to the bucket.
+def score_posts(cursor, rows, full_rebuild=False, cache=None):
+    posts = pd.DataFrame(rows, columns=POST_COLUMNS)
+    posts['sentiment'] = score_batch(posts['content'], cache)
+    posts['weighted_sentiment'] = posts['sentiment'] * posts['score'].astype(float)
+    flush_sentiment_updates(cursor, list(zip(posts['id'].tolist(), posts['created_date'].tolist(), posts['sentiment'].tolist(), posts['weighted_sentiment'].tolist())))
+
+    previous_weighted = posts['previous_weighted'].astype(float)
+    if full_rebuild:
+        posts['sentiment_delta'] = posts['weighted_sentiment']
+        posts['posts_delta'] = 1
+    else:
+        posts['sentiment_delta'] = posts['weighted_sentiment'] - previous_weighted.fillna(0)
+        posts['posts_delta'] = previous_weighted.isna().astype(int)
+
+    return posts.groupby(BUCKET_KEYS, dropna=False)[['sentiment_delta', 'posts_delta']].sum(), posts['ticker'].value_counts()
+
+# By default only posts without a sentiment are scored: new posts, and posts whose
+# processed_content was rewritten by collect_data (which resets sentiment to NULL).
+# Their previous weighted_sentiment is swapped out of the running sums, so untouched
+# days are never re-aggregated. full_rebuild rescans every post, for backfills.
+# since_date only applies to incremental runs: a full rebuild of part of a week or month would
+# overwrite its rollups with partial sums.
+# conn must not be in autocommit: the score write-backs and every upsert of the run commit
+# together, so a run that fails part way leaves no post scored without its deltas.
+def analyze_sentiment(conn, tickers, subreddits, batch_size=DB_BATCH_SIZE, full_rebuild=False, since_date=None):
+    if full_rebuild and since_date:
+        print("Ignoring since_date for a full rebuild")
+        since_date = None
     cursor = conn.cursor()
-    results = []
+    calculated_at = datetime.now()
+    cache = get_score_cache()
+    try:
+        # Taken before posts are read, a run queued behind another one only sees posts it left unscored
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (ANALYZER_LOCK_ID,))
+        results = aggregate_sentiment(conn, cursor, tickers, subreddits, batch_size, full_rebuild, since_date, calculated_at, cache)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
 
-    for ticker in tickers:
-        total_sentiment_by_date = {}
-        total_posts_by_date = {}
-
-        for subreddit in subreddits:
-            cursor.execute(sql.SQL("""
-                SELECT id, processed_content, score, created_date FROM reddit_posts
-                WHERE ticker = %s AND subreddit = %s AND processed_content IS NOT NULL
-            """), (ticker, subreddit))
-            posts = cursor.fetchall()
-            print(f"Found {len(posts)} posts for {ticker} in r/{subreddit}")
-
-            subreddit_sentiment_by_date = {}
-            subreddit_posts_by_date = {}
-
-            for post_id, content, score, created_date in posts:
-                sentiment = calculate_sentiment(content)
-                created_date_str = created_date.strftime('%Y-%m-%d') if created_date else None
-                cursor.execute(sql.SQL("""
-                    UPDATE reddit_posts
-                    SET sentiment = %s
-                    WHERE id = %s
-                """), (sentiment, post_id))
-
-                weighted_sentiment = sentiment * score
-
-                if created_date_str not in subreddit_sentiment_by_date:
-                    subreddit_sentiment_by_date[created_date_str] = 0
-                    subreddit_posts_by_date[created_date_str] = 0
-
-                subreddit_sentiment_by_date[created_date_str] += weighted_sentiment
-                subreddit_posts_by_date[created_date_str] += 1
-
-                if created_date_str not in total_sentiment_by_date:
-                    total_sentiment_by_date[created_date_str] = 0
-                    total_posts_by_date[created_date_str] = 0
-
-                total_sentiment_by_date[created_date_str] += weighted_sentiment
-                total_posts_by_date[created_date_str] += 1
-            
-            print(f"Calculated sentiment for {len(posts)} posts in r/{subreddit}")
-
-            # per subreddit sentiment scores
-            for created_date_str, total_sentiment in subreddit_sentiment_by_date.items():
-                total_posts = subreddit_posts_by_date[created_date_str]
-                avg_sentiment = total_sentiment / total_posts if total_posts > 0 else 0
-
-                print(f"Calculated sentiment for {total_posts} posts on {created_date_str} in r/{subreddit}")
-                
-                cursor.execute(sql.SQL("""
-                    INSERT INTO ticker_sentiment (id, ticker, subreddit, sentiment, sample_size, calculated_at, date, date_str) 
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (id, date_str) DO UPDATE SET
-                    sentiment = EXCLUDED.sentiment,
-                    sample_size = EXCLUDED.sample_size,
-                    calculated_at = EXCLUDED.calculated_at
-                    RETURNING (xmax = 0) AS inserted
-                """), (f"{ticker}_{subreddit}", ticker, subreddit, avg_sentiment, total_posts, datetime.now(), created_date, created_date_str))
-                
-                result = cursor.fetchone()
-                if result and not result[0]:
-                    print(f"Conflict triggered for {ticker} on {created_date_str} in r/{subreddit}")
-                else:
-                    print(f"Inserted new record for {ticker} on {created_date_str} in r/{subreddit}")
-        
+    if cache:
+        print("Score cache:", cache.stats())
+    print("Sentiment analysis completed, generated results for", len(results), "tickers")
+    return results
+
+# Score the posts, upsert every changed bucket, rollup and catalog row, and build the per-ticker results
+def aggregate_sentiment(conn, cursor, tickers, subreddits, batch_size, full_rebuild, since_date, calculated_at, cache):
+    # Running totals per (ticker, subreddit, created_date), plus posts scored per ticker
+    totals = None
+    posts_scored = pd.Series(0, index=list(tickers))
+
+    for rows in fetch_posts(conn, tickers, subreddits, batch_size, full_rebuild, since_date):
+        batch_totals, batch_counts = score_posts(cursor, rows, full_rebuild, cache)
+        totals = batch_totals if totals is None else totals.add(batch_totals, fill_value=0)
+        posts_scored = posts_scored.add(batch_counts, fill_value=0)
+
+    results = []
+    if totals is not None:
         # aggregated sentiment across all subreddits
-        for created_date_str, total_sentiment in total_sentiment_by_date.items():
-            total_posts = total_posts_by_date[created_date_str]
-            avg_total_sentiment = total_sentiment / total_posts if total_posts > 0 else 0
-
-            cursor.execute(sql.SQL("""
-                INSERT INTO ticker_sentiment (id, ticker, subreddit, sentiment, sample_size, calculated_at, date, date_str) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (id, date_str) DO UPDATE SET
-                sentiment = EXCLUDED.sentiment,
-                sample_size = EXCLUDED.sample_size,
-                calculated_at = EXCLUDED.calculated_at
-            """), (f"{ticker}_all", ticker, "all", avg_total_sentiment, total_posts, datetime.now(), created_date, created_date_str))
+        all_totals = totals.groupby(level=['ticker', 'created_date'], dropna=False).sum()
+        all_totals = pd.concat({'all': all_totals}, names=['subreddit']).reorder_levels(BUCKET_KEYS)
+
+        sentiment_rows = bucket_rows(totals, calculated_at) + bucket_rows(all_totals, calculated_at)
+        upsert_ticker_sentiment(cursor, sentiment_rows, full_rebuild, batch_size)
+
+        # Pre-shaped structures served by the dashboard API
+        changed_buckets = pd.concat([totals, all_totals])
+        upsert_sentiment_rollups(cursor, changed_buckets, calculated_at, full_rebuild, batch_size)
+        upsert_sentiment_catalog(cursor, changed_buckets, calculated_at, full_rebuild)
+        print("Sentiment version:", bump_sentiment_version(cursor))
+        print(f"Scored {int(posts_scored.sum())} posts into {len(sentiment_rows)} sentiment buckets")
+    else:
+        all_totals = pd.DataFrame(columns=['sentiment_delta'], index=pd.MultiIndex.from_tuples([], names=BUCKET_KEYS))
 
+    for ticker in tickers:
+        ticker_totals = all_totals[all_totals.index.get_level_values('ticker') == ticker]
         results.append({
             'ticker': ticker,
-            'total_sentiment_by_date': total_sentiment_by_date
+            'posts_scored': int(posts_scored.get(ticker, 0)),
+            'total_sentiment_by_date': {
+                None if pd.isna(created_date) else created_date.strftime('%Y-%m-%d'): float(total_sentiment)
+                for (_, _, created_date), total_sentiment in ticker_totals['sentiment_delta'].items()
+            }
         })
-
-    cursor.close()
-    print("Sentiment analysis completed, generated results for", len(results), "tickers")
     return results
 
 # Lambda Handler
@@ -136,11 +303,16 @@ def lambda_handler(event, context):
 
         tickers = body.get('tickers', [])
         subreddits = body.get('subreddits', [])
+        batch_size = body.get('batch_size', DB_BATCH_SIZE)
+        full_rebuild = body.get('full_rebuild', False)
+        since_date = body.get('since_date')
 
-        conn = connect_db()
+        conn = connect_db(autocommit=False)
         if conn:
-            results = analyze_sentiment(conn, tickers, subreddits)
-            conn.close()
+            try:
+                results = analyze_sentiment(conn, tickers, subreddits, batch_size, full_rebuild, since_date)
+            finally:
+                release_db(conn)
             return {
                 'statusCode': 200,
                 'body': json.dumps({'results': results}, default=str)
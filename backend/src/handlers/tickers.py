@@ -0,0 +1,28 @@
+import re
+from functools import lru_cache
+
+# A ticker is mentioned when it appears as a whole word in a post's title or body, in any case
+@lru_cache(maxsize=None)
+def ticker_pattern(ticker):
+    return re.compile(rf'\b{re.escape(ticker)}\b', re.IGNORECASE)
+
+def post_text(title, content):
+    return f"{title}\n{content}"
+
+# The given tickers mentioned in text, earliest mention first
+def mentioned_tickers(text, tickers):
+    positions = {}
+    for ticker in tickers:
+        match = ticker_pattern(ticker).search(text)
+        if match:
+            positions[ticker] = (match.start(), ticker)
+    return sorted(positions, key=positions.get)
+
+# The single ticker a post is stored under: its earliest mentioned ticker, so the same post maps
+# to the same ticker whichever search found it. Posts mentioning none of them fall back to the
+# first ticker alphabetically.
+def primary_ticker(text, tickers):
+    mentioned = mentioned_tickers(text, tickers)
+    if mentioned:
+        return mentioned[0]
+    return min(tickers) if tickers else None
@@ -0,0 +1,26 @@
+import base64
+import json
+import zlib
+
+# Compact encoding for posts passed from the scraper Lambda to the collector: the projected
+# fields as columns (field names once, not per post), JSON encoded, zlib compressed and base64'd
+# so the result still fits in a JSON Lambda response.
+COLUMNAR_ZLIB = 'columnar+zlib'
+
+# Everything collect_data stores or needs for attribution
+STORED_FIELDS = ['id', 'title', 'content', 'score', 'created_utc', 'subreddit', 'tickers']
+
+def encode_posts(posts, fields=STORED_FIELDS, level=6):
+    columns = [[post.get(field) for post in posts] for field in fields]
+    raw = json.dumps({'fields': fields, 'columns': columns}, separators=(',', ':')).encode('utf-8')
+    return {
+        'encoding': COLUMNAR_ZLIB,
+        'count': len(posts),
+        'data': base64.b64encode(zlib.compress(raw, level)).decode('ascii')
+    }
+
+def decode_posts(payload):
+    if payload['encoding'] != COLUMNAR_ZLIB:
+        raise ValueError(f"Unsupported posts encoding: {payload['encoding']}")
+    table = json.loads(zlib.decompress(base64.b64decode(payload['data'])))
+    return [dict(zip(table['fields'], row)) for row in zip(*table['columns'])]
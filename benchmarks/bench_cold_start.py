@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+HANDLERS_DIR = os.path.join(BENCHMARKS_DIR, '..', 'backend', 'src', 'handlers')
+BUDGET_PATH = os.path.join(BENCHMARKS_DIR, 'cold_start_budget.json')
+
+# Fresh interpreter per measurement, so nothing is already imported
+PROBE = """
+import sys, time
+start = time.perf_counter()
+handler = __import__(sys.argv[1])
+import_ms = (time.perf_counter() - start) * 1000
+first_preprocess_ms = None
+if hasattr(handler, 'preprocess_content'):
+    start = time.perf_counter()
+    handler.preprocess_content("Cold start probe for $TSLA, see https://example.com")
+    first_preprocess_ms = (time.perf_counter() - start) * 1000
+print(import_ms, first_preprocess_ms)
+"""
+
+def probe(handler):
+    env = dict(os.environ)
+    for var in ('DB_NAME', 'DB_USER', 'DB_PASSWORD', 'DB_HOST', 'DB_PORT',
+                'REDDIT_CLIENT_ID', 'REDDIT_CLIENT_SECRET', 'REDDIT_USER_AGENT'):
+        env.setdefault(var, 'cold-start-probe')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE, handler],
+        cwd=HANDLERS_DIR, env=env, capture_output=True, text=True, check=True
+    )
+
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    imports = []
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and 'cumulative' not in line:
+            _, cumulative, package = line[len('import time:'):].split('|')
+            if not package.startswith('  '):
+                imports.append((int(cumulative) / 1000, package.strip()))
+
+    import_ms, first_preprocess_ms = result.stdout.split()
+    return float(import_ms), None if first_preprocess_ms == 'None' else float(first_preprocess_ms), sorted(imports, reverse=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Report handler cold-start import time against the checked-in budget')
+    parser.add_argument('--handlers', type=str, default='collect_data', help='Comma separated handler modules (default: collect_data)')
+    parser.add_argument('--top', type=int, default=10, help='Slowest top-level imports to list (default: 10)')
+    args = parser.parse_args()
+
+    with open(BUDGET_PATH) as f:
+        budgets = json.load(f)
+
+    over_budget = False
+    for handler in args.handlers.split(','):
+        import_ms, first_preprocess_ms, imports = probe(handler)
+        budget = budgets.get(handler, {})
+        print(f"{handler}: import {import_ms:.0f}ms (budget {budget.get('import_ms', '-')}ms)")
+        if first_preprocess_ms is not None:
+            print(f"{handler}: first preprocess {first_preprocess_ms:.0f}ms (budget {budget.get('first_preprocess_ms', '-')}ms)")
+        for cumulative_ms, package in imports[:args.top]:
+            print(f"    {cumulative_ms:8.1f}ms  {package}")
+
+        if import_ms > budget.get('import_ms', float('inf')):
+            over_budget = True
+        if first_preprocess_ms is not None and first_preprocess_ms > budget.get('first_preprocess_ms', float('inf')):
+            over_budget = True
+
+    if over_budget:
+        print("Cold start is over budget")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
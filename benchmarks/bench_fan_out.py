@@ -0,0 +1,59 @@
+import argparse
+import io
+import json
+import time
+
+from bench_store_in_db import StandInConnection
+from sample_posts import import_handler, load_posts
+
+# Stand-in for boto3's Lambda client that answers like reddit_scraper_function after a fixed delay
+class StubLambdaClient:
+    def __init__(self, posts_by_pair, latency):
+        self.posts_by_pair = posts_by_pair
+        self.latency = latency
+        self.invocations = 0
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        request = json.loads(Payload)
+        time.sleep(self.latency)
+        self.invocations += 1
+        posts = [
+            dict(post, tickers=[ticker])
+            for ticker in request['tickers']
+            for subreddit in request['subreddits']
+            for post in self.posts_by_pair.get((ticker, subreddit), [])
+        ]
+        body = json.dumps({'statusCode': 200, 'body': json.dumps({'posts': posts})})
+        return {'Payload': io.BytesIO(body.encode())}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scraper fan-out in collect_data.fetch_and_store')
+    parser.add_argument('--latency-ms', type=float, default=500.0, help='Simulated scraper invocation time (default: 500ms)')
+    parser.add_argument('--concurrency', type=str, default='1,4,8,16', help='Comma separated concurrency levels')
+    parser.add_argument('--tickers-per-query', type=int, default=1, help='Tickers per scraper invocation (default: 1)')
+    parser.add_argument('--db-writers', type=int, default=2, help='DB writer threads in the store stage (default: 2)')
+    parser.add_argument('--queue-size', type=int, default=4, help='Bounded queue size between stages (default: 4)')
+    args = parser.parse_args()
+
+    collect_data = import_handler('collect_data')
+    collect_data.connect_db = lambda: StandInConnection(0.001)
+    collect_data.SCRAPER_TICKERS_PER_QUERY = args.tickers_per_query
+
+    posts_by_pair = {}
+    for post in load_posts():
+        posts_by_pair.setdefault((post['ticker'], post['subreddit']), []).append(post)
+    tickers = sorted({ticker for ticker, _ in posts_by_pair})
+    subreddits = sorted({subreddit for _, subreddit in posts_by_pair})
+
+    for concurrency in [int(level) for level in args.concurrency.split(',')]:
+        client = StubLambdaClient(posts_by_pair, args.latency_ms / 1000)
+        start = time.perf_counter()
+        stats = collect_data.fetch_and_store(tickers, subreddits, False, concurrency=concurrency, client=client, incremental=False,
+                                             db_writers=args.db_writers, queue_size=args.queue_size)
+        elapsed = time.perf_counter() - start
+        print(f"concurrency={concurrency}: {client.invocations} invocations in {elapsed:.2f}s")
+        for stage, stage_stats in stats.items():
+            print(f"    {stage:<11} utilization={stage_stats['utilization']:.2f} blocked={stage_stats['blocked_seconds']:.2f}s avg_queue_depth={stage_stats['avg_queue_depth']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import glob
+import os
+import time
+
+from sample_posts import SCRAPED_DATA_DIR, import_local
+
+# Stand-in for a psycopg2 connection: COPY drains the buffer, every statement costs a round trip
+class StandInCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def copy_expert(self, query, buffer):
+        time.sleep(self.connection.rtt)
+        self.connection.copied_rows += buffer.getvalue().count('\n')
+        self.connection.copied_bytes += len(buffer.getvalue())
+
+    def execute(self, query, args=None):
+        time.sleep(self.connection.rtt)
+
+    def fetchone(self):
+        return (0,)
+
+    def close(self):
+        pass
+
+class StandInConnection:
+    def __init__(self, rtt):
+        self.rtt = rtt
+        self.copied_rows = 0
+        self.copied_bytes = 0
+
+    def cursor(self):
+        return StandInCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scraped_data bulk importer')
+    parser.add_argument('--dsn', type=str, default=None, help='Scratch Postgres DSN, migrated (default: in-process stand-in)')
+    parser.add_argument('--rtt-ms', type=float, default=2.0, help='Simulated round trip for the stand-in (default: 2ms)')
+    parser.add_argument('--chunk-sizes', type=str, default='1000,10000', help='Comma separated posts per COPY')
+    parser.add_argument('--repeat', type=int, default=5, help='Passes over the files, to get past startup noise (default: 5)')
+    parser.add_argument('--preprocess', action='store_true', help='Include preprocessing on the way in')
+    args = parser.parse_args()
+
+    importer = import_local('import_scraped_data')
+    paths = sorted(glob.glob(os.path.join(SCRAPED_DATA_DIR, 'reddit_posts_*.csv'))) * args.repeat
+
+    for chunk_size in [int(size) for size in args.chunk_sizes.split(',')]:
+        if args.dsn:
+            import psycopg2
+            conn = psycopg2.connect(args.dsn)
+            # Start each run from an empty table so the posts are inserted, not skipped
+            post_ids = [post['post_id'] for post in importer.iter_csv_posts(sorted(set(paths)), {'read': 0, 'duplicates': 0, 'invalid': 0})]
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM reddit_posts WHERE post_id = ANY(%s)", (post_ids,))
+            cursor.execute("DELETE FROM reddit_post_ids WHERE post_id = ANY(%s)", (post_ids,))
+            conn.commit()
+            cursor.close()
+        else:
+            conn = StandInConnection(args.rtt_ms / 1000)
+
+        # Deduplication is per run, so repeated passes count as duplicates after the first
+        stats = importer.import_files(conn, paths, chunk_size, preprocess=args.preprocess)
+        conn.close()
+        print(f"chunk_size={chunk_size}: {stats['read'] / max(stats['seconds'], 0.001):,.0f} rows/sec "
+              f"({stats['read']} read, {stats['duplicates']} duplicates, {stats['inserted']} inserted, {stats['seconds']}s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sample_posts import import_handler, import_local, load_posts
+
+# The per-call pipeline collect_data used before Preprocessor, kept as the baseline
+def legacy_preprocess_content(content):
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+    from nltk.tokenize import word_tokenize
+
+    content = content.lower()
+    stop_words = set(stopwords.words('english'))
+    content = " ".join([w for w in word_tokenize(re.sub(r'[^\w\s]', '', content)) if w not in stop_words])
+    lemmatizer = WordNetLemmatizer()
+    content = " ".join([lemmatizer.lemmatize(word) for word in word_tokenize(content)])
+    content = re.sub(r'http\S+|www\S+|https\S+', '', content)
+    content = re.sub(r'[^a-zA-Z\s]', '', content)
+    return content
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark text preprocessing on scraped_data posts')
+    parser.add_argument('--posts', type=int, default=None, help='Number of posts to process (default: all)')
+    parser.add_argument('--workers', type=str, default='1,2,4,8', help='Comma separated worker process counts for preprocess_reddit; 1 runs without a pool')
+    args = parser.parse_args()
+
+    collect_data = import_handler('collect_data')
+    texts = [post['content'] for post in load_posts(args.posts)]
+
+    start = time.perf_counter()
+    before = [legacy_preprocess_content(text) for text in texts]
+    legacy_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    after = collect_data.Preprocessor().process_many(texts)
+    elapsed = time.perf_counter() - start
+
+    mismatches = sum(1 for old, new in zip(before, after) if old != new)
+    print(f"before: {len(texts) / legacy_elapsed:,.0f} posts/sec")
+    print(f"after:  {len(texts) / elapsed:,.0f} posts/sec ({legacy_elapsed / elapsed:.1f}x)")
+    print(f"{mismatches} of {len(texts)} outputs differ")
+
+    # Worker processes as preprocess_reddit.py --workers runs them. Each pool is warmed with
+    # one pass first, so worker startup and NLTK loading are not timed.
+    preprocess_reddit = import_local('preprocess_reddit')
+    for workers in [int(count) for count in args.workers.split(',')]:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=preprocess_reddit.init_worker) if workers > 1 else None
+        try:
+            preprocess_reddit.preprocess_texts(texts, executor)
+            start = time.perf_counter()
+            processed = preprocess_reddit.preprocess_texts(texts, executor)
+            elapsed = time.perf_counter() - start
+        finally:
+            if executor:
+                executor.shutdown()
+        print(f"workers={workers}: {len(texts) / elapsed:,.0f} posts/sec ({'matches' if processed == after else 'differs from'} single process)")
+
+if __name__ == '__main__':
+    main()
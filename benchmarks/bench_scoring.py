@@ -0,0 +1,33 @@
+import argparse
+import time
+
+from sample_posts import import_handler, load_posts
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sentiment scoring throughput on scraped_data posts')
+    parser.add_argument('--posts', type=int, default=None, help='Number of posts to score (default: all)')
+    parser.add_argument('--batch-size', type=int, default=500, help='Posts per score_batch call (default: 500)')
+    args = parser.parse_args()
+
+    sentiment_analyzer = import_handler('sentiment_analyzer')
+    texts = [post['content'] for post in load_posts(args.posts)]
+    print(f"{len(texts)} posts, {len(set(texts))} distinct texts")
+
+    # One uncached polarity_scores call per post, as analyze_sentiment used to do
+    start = time.perf_counter()
+    for text in texts:
+        sentiment_analyzer.analyzer.polarity_scores(text)['compound']
+    per_post_elapsed = time.perf_counter() - start
+
+    sentiment_analyzer.calculate_sentiment.cache_clear()
+    start = time.perf_counter()
+    for offset in range(0, len(texts), args.batch_size):
+        sentiment_analyzer.score_batch(texts[offset:offset + args.batch_size])
+    batch_elapsed = time.perf_counter() - start
+
+    print(f"per post:    {len(texts) / per_post_elapsed:,.0f} posts/sec")
+    print(f"score_batch: {len(texts) / batch_elapsed:,.0f} posts/sec ({per_post_elapsed / batch_elapsed:.1f}x)")
+    print(sentiment_analyzer.calculate_sentiment.cache_info())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import time
+
+from sample_posts import import_handler, load_posts
+
+# Stand-in for a psycopg2 connection that charges a fixed round trip per statement
+class StandInCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.pending = []
+
+    def mogrify(self, template, args):
+        self.pending.append(args)
+        return repr(args).encode()
+
+    def execute(self, query, args=None):
+        time.sleep(self.connection.rtt)
+        self.connection.statements += 1
+        self.query = str(query)
+        self.args = args
+
+    def fetchall(self):
+        rows, self.pending = self.pending, []
+        claimed = self.connection.claimed
+        # claim_post_dates inserts (post_id, created_date) pairs, returning the new post_ids,
+        # then reads back the date of every post
+        if 'INSERT INTO reddit_post_ids' in self.query:
+            new = [(post_id, created_date) for post_id, created_date in rows if post_id not in claimed]
+            claimed.update(new)
+            return [(post_id,) for post_id, _ in new]
+        if 'FROM reddit_post_ids' in self.query:
+            return [(post_id, claimed[post_id]) for post_id in self.args[0] if post_id in claimed]
+        return [(row[0],) for row in rows]
+
+    # ensure_reddit_posts_partitions returns the retention cutoff, none here
+    def fetchone(self):
+        return (None,)
+
+    def close(self):
+        pass
+
+class StandInConnection:
+    encoding = 'UTF8'
+
+    def __init__(self, rtt):
+        self.rtt = rtt
+        self.statements = 0
+        self.claimed = {}
+
+    def cursor(self):
+        return StandInCursor(self)
+
+    def close(self):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark store_in_db batch sizes')
+    parser.add_argument('--dsn', type=str, default=None, help='Scratch Postgres DSN (default: in-process stand-in)')
+    parser.add_argument('--rtt-ms', type=float, default=2.0, help='Simulated round trip for the stand-in (default: 2ms)')
+    parser.add_argument('--posts', type=int, default=1000, help='Number of posts from scraped_data to store')
+    parser.add_argument('--batch-sizes', type=str, default='1,100,500', help='Comma separated batch sizes; 1 matches the old per-row path')
+    args = parser.parse_args()
+
+    collect_data = import_handler('collect_data')
+    posts = load_posts(args.posts)
+    for post in posts:
+        post['processed_content'] = None
+
+    for batch_size in [int(size) for size in args.batch_sizes.split(',')]:
+        if args.dsn:
+            import psycopg2
+            conn = psycopg2.connect(args.dsn)
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM reddit_posts WHERE post_id = ANY(%s)", ([post['id'] for post in posts],))
+            cursor.execute("DELETE FROM reddit_post_ids WHERE post_id = ANY(%s)", ([post['id'] for post in posts],))
+        else:
+            conn = StandInConnection(args.rtt_ms / 1000)
+
+        start = time.perf_counter()
+        first = collect_data.store_in_db(conn, posts, batch_size)
+        second = collect_data.store_in_db(conn, posts, batch_size)
+        elapsed = time.perf_counter() - start
+        conn.close()
+
+        print(f"batch_size={batch_size}: {2 * len(posts) / elapsed:,.0f} posts/sec "
+              f"(first run {first['inserted']} inserted / {first['updated']} updated, "
+              f"second run {second['inserted']} inserted / {second['updated']} updated)")
+
+if __name__ == '__main__':
+    main()
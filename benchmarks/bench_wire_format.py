@@ -0,0 +1,40 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from sample_posts import load_posts
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'src', 'handlers'))
+from wire_format import STORED_FIELDS, decode_posts, encode_posts
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare scraper payload size and decode time per wire format')
+    parser.add_argument('--repeat', type=int, default=20, help='Decode repetitions per measurement (default: 20)')
+    args = parser.parse_args()
+
+    # One payload per ticker, as a scraper invocation over all subreddits would return it
+    payloads = {}
+    for post in load_posts():
+        payloads.setdefault(post['ticker'], []).append(dict(post, tickers=[post['ticker']]))
+
+    print(f"{'ticker':8} {'posts':>6} {'json KB':>9} {'compact KB':>11} {'ratio':>6} {'json ms':>8} {'compact ms':>11}")
+    for ticker, posts in sorted(payloads.items()):
+        # Legacy response: the post list as a JSON string inside the JSON Lambda response
+        legacy = json.dumps({'statusCode': 200, 'body': json.dumps({'posts': posts})})
+        compact = json.dumps({'statusCode': 200, **encode_posts(posts, STORED_FIELDS)})
+
+        legacy_ms = timed(lambda: json.loads(json.loads(legacy)['body'])['posts'], args.repeat)
+        compact_ms = timed(lambda: decode_posts(json.loads(compact)), args.repeat)
+        print(f"{ticker:8} {len(posts):6} {len(legacy) / 1024:9.1f} {len(compact) / 1024:11.1f} "
+              f"{len(legacy) / len(compact):6.1f} {legacy_ms:8.2f} {compact_ms:11.2f}")
+
+if __name__ == '__main__':
+    main()
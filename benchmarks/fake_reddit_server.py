@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from sample_posts import import_handler, load_posts
+
+# Minimal stand-in for Reddit's OAuth API: token endpoint plus subreddit search over the
+# scraped_data posts, with x-ratelimit-* headers and 429s once the window's quota is spent
+class FakeReddit:
+    def __init__(self, quota, window):
+        self.quota = quota
+        self.window = window
+        self.window_start = time.time()
+        self.used = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+        self.posts = load_posts()
+
+    def take(self):
+        with self.lock:
+            now = time.time()
+            if now - self.window_start >= self.window:
+                self.window_start, self.used = now, 0
+            reset = self.window - (now - self.window_start)
+            if self.used >= self.quota:
+                self.throttled += 1
+                return False, 0, reset
+            self.used += 1
+            return True, self.quota - self.used, reset
+
+    def search(self, subreddits, query, limit, after):
+        terms = [term.lower() for term in re.findall(r'"([^"]+)"', query)]
+        subreddits = {name.lower() for name in subreddits.split('+')}
+        matches = [
+            post for post in sorted(self.posts, key=lambda post: post['created_utc'], reverse=True)
+            if post['subreddit'].lower() in subreddits and any(term in f"{post['title']} {post['content']}".lower() for term in terms)
+        ]
+        start = next((index + 1 for index, post in enumerate(matches) if f"t3_{post['id']}" == after), 0) if after else 0
+        page = matches[start:start + limit]
+        return {
+            'kind': 'Listing',
+            'data': {
+                'after': f"t3_{page[-1]['id']}" if len(page) == limit else None,
+                'dist': len(page),
+                'children': [{
+                    'kind': 't3',
+                    'data': {
+                        'id': post['id'],
+                        'name': f"t3_{post['id']}",
+                        'title': post['title'],
+                        'selftext': post['content'],
+                        'score': post['score'],
+                        'created_utc': post['created_utc'],
+                        'url': post['url'],
+                        'num_comments': post['num_comments'],
+                        'subreddit': post['subreddit']
+                    }
+                } for post in page]
+            }
+        }
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, status, payload, remaining=None, reset=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            if remaining is not None:
+                self.send_header('x-ratelimit-remaining', str(remaining))
+                self.send_header('x-ratelimit-used', str(fake.quota - remaining))
+                self.send_header('x-ratelimit-reset', str(int(reset) + 1))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self.send_json(200, {'access_token': 'fake', 'token_type': 'bearer', 'expires_in': 3600, 'scope': '*'})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            match = re.match(r'^/r/([^/]+)/search', url.path)
+            if not match:
+                self.send_json(404, {'error': 404})
+                return
+            allowed, remaining, reset = fake.take()
+            if not allowed:
+                self.send_json(429, {'error': 429}, 0, reset)
+                return
+            params = parse_qs(url.query)
+            listing = fake.search(match.group(1), params.get('q', [''])[0], int(params.get('limit', ['100'])[0]), params.get('after', [None])[0])
+            self.send_json(200, listing, remaining, reset)
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Reddit API for exercising the scraper rate-limit scheduler offline')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--quota', type=int, default=20, help='Requests allowed per window (default: 20)')
+    parser.add_argument('--window', type=float, default=10.0, help='Rate limit window in seconds (default: 10)')
+    parser.add_argument('--serve', action='store_true', help='Only run the server')
+    args = parser.parse_args()
+
+    fake = FakeReddit(args.quota, args.window)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(fake))
+    if args.serve:
+        server.serve_forever()
+        return
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Point the scraper at the fake server and run every ticker as its own scheduled query
+    base_url = f"http://127.0.0.1:{args.port}"
+    os.environ.update({
+        'REDDIT_CLIENT_ID': 'fake', 'REDDIT_CLIENT_SECRET': 'fake', 'REDDIT_USER_AGENT': 'fake-reddit-bench',
+        'REDDIT_OAUTH_URL': base_url, 'REDDIT_URL': base_url,
+        'REDDIT_TICKERS_PER_QUERY': '1', 'REDDIT_REQUESTS_PER_MINUTE': str(args.quota * 60 / args.window)
+    })
+    reddit_scraper = import_handler('reddit_scraper')
+
+    tickers = sorted({post['ticker'] for post in fake.posts})
+    subreddits = sorted({post['subreddit'] for post in fake.posts})
+    volumes = {ticker: sum(1 for post in fake.posts if post['ticker'] == ticker) for ticker in tickers}
+
+    start = time.perf_counter()
+    posts, unattributed, failed = reddit_scraper.get_posts_scheduled(subreddits, tickers, 100 * len(tickers), ticker_volumes=volumes)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(posts)} posts ({unattributed} unattributed, failed: {failed or 'none'}) in {elapsed:.2f}s")
+    print(f"server answered {fake.throttled} requests with 429")
+    print("scheduler:", reddit_scraper.scheduler.stats())
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import csv
+import glob
+import os
+import sys
+
+SCRAPED_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scraped_data')
+
+# Post bodies can be larger than the default csv field limit
+csv.field_size_limit(sys.maxsize)
+
+# Load the scraped_data CSVs as the post dicts returned by the scraper
+def load_posts(limit=None):
+    posts = []
+    for path in sorted(glob.glob(os.path.join(SCRAPED_DATA_DIR, 'reddit_posts_*.csv'))):
+        subreddit, ticker = os.path.basename(path)[len('reddit_posts_'):-len('.csv')].rsplit('_', 1)
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                posts.append({
+                    'id': row['PostID'],
+                    'ticker': ticker,
+                    'subreddit': subreddit,
+                    'title': row['Title'],
+                    'content': row['Content'],
+                    'score': int(row['Score']),
+                    'created_utc': float(row['Date']),
+                    'url': row['URL'],
+                    'num_comments': int(row['Comments'])
+                })
+                if limit and len(posts) >= limit:
+                    return posts
+    return posts
+
+# Make the Lambda handlers importable without a deployed environment
+def import_handler(name):
+    for var in ('DB_NAME', 'DB_USER', 'DB_PASSWORD', 'DB_HOST', 'DB_PORT'):
+        os.environ.setdefault(var, '')
+    handlers_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'src', 'handlers')
+    if handlers_dir not in sys.path:
+        sys.path.insert(0, handlers_dir)
+    return __import__(name)
+
+# Make the local scripts importable, they load .env and share the handlers' db module
+def import_local(name):
+    local_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'local')
+    if local_dir not in sys.path:
+        sys.path.insert(0, local_dir)
+    return __import__(name)
@@ -0,0 +1,65 @@
+const crypto = require('crypto');
+
+// In-process LRU of serialized responses. Entries are tagged with the sentiment version they
+// were built from and expire after ttlMs, so a missed notification only serves stale data
+// for one TTL at most.
+class ResponseCache {
+    constructor({ maxEntries = 500, ttlMs = 5 * 60 * 1000 } = {}) {
+        this.maxEntries = maxEntries;
+        this.ttlMs = ttlMs;
+        this.entries = new Map();
+        this.version = null;
+        this.hits = 0;
+        this.misses = 0;
+    }
+
+    get(key) {
+        const entry = this.entries.get(key);
+        if (!entry || entry.version !== this.version || entry.expiresAt <= Date.now()) {
+            this.entries.delete(key);
+            this.misses += 1;
+            return null;
+        }
+        // Map keeps insertion order, re-inserting marks the entry most recently used
+        this.entries.delete(key);
+        this.entries.set(key, entry);
+        this.hits += 1;
+        return entry;
+    }
+
+    // version is the stamp current when the value was read, a value built while the stamp
+    // changed underneath it (or with no stamp at all) is returned but not kept
+    set(key, value, version, headers = {}) {
+        const body = JSON.stringify(value);
+        const entry = {
+            body,
+            headers,
+            etag: `W/"${crypto.createHash('sha1').update(body).digest('base64url')}"`,
+            version,
+            expiresAt: Date.now() + this.ttlMs,
+        };
+        if (version === null || version !== this.version) {
+            return entry;
+        }
+        this.entries.delete(key);
+        this.entries.set(key, entry);
+        while (this.entries.size > this.maxEntries) {
+            this.entries.delete(this.entries.keys().next().value);
+        }
+        return entry;
+    }
+
+    // Called with the analyzer's version stamp, drops everything built from an older one
+    setVersion(version) {
+        if (version !== this.version) {
+            this.version = version;
+            this.entries.clear();
+        }
+    }
+
+    stats() {
+        return { entries: this.entries.size, version: this.version, hits: this.hits, misses: this.misses };
+    }
+}
+
+module.exports = { ResponseCache };
@@ -2,9 +2,10 @@ require('dotenv').config({ path: "/home/harishj/stock-sentiment-analysis/stock-s
 const express = require('express');
 const cors = require('cors');
 const { Pool } = require('pg');
+const { ResponseCache } = require('./cache');
 
 const app = express();
-app.use(cors());
+app.use(cors({ exposedHeaders: ['ETag', 'X-Next-Cursor'] }));
 app.use(express.json());
 
 // PostgreSQL connection
@@ -13,60 +14,186 @@ const pool = new Pool({
     ssl: { rejectUnauthorized: false },
 });
 
-// Fetch available tickers
-app.get('/tickers', async (req, res) => {
-    try {
-        const result = await pool.query('SELECT DISTINCT ticker FROM ticker_sentiment');
-        res.json(result.rows);
-        console.log(result.rows);
-    } catch (err) {
-        res.status(500).json({ error: err.message });
-    }
+// An idle client losing its connection is removed from the pool; without a listener the
+// error event would crash the process
+pool.on('error', (err) => console.error('Idle database client failed:', err.message));
+
+const cache = new ResponseCache({
+    maxEntries: parseInt(process.env.CACHE_MAX_ENTRIES || '500', 10),
+    ttlMs: parseInt(process.env.CACHE_TTL_MS || '300000', 10),
 });
 
-// Fetch available subreddits
-app.get('/subreddits', async (req, res) => {
+// Keep the cache on the analyzer's version stamp: read it once, then follow the
+// sentiment_updated notifications on a dedicated connection. If that connection drops,
+// the cache is bypassed until it is re-established and the stamp re-read. A failing
+// connection can raise both an error event and a rejected query, so it is released and
+// retried once.
+const listenForVersion = async () => {
+    let client;
+    let released = false;
+    const retry = (message, err) => {
+        if (released) return;
+        released = true;
+        console.error(message, err.message);
+        cache.setVersion(null);
+        if (client) client.release(err);
+        setTimeout(listenForVersion, 5000);
+    };
     try {
-        const result = await pool.query('SELECT DISTINCT subreddit FROM ticker_sentiment');
-        res.json(result.rows);
-        console.log(result.rows);
+        client = await pool.connect();
+        client.on('notification', (msg) => cache.setVersion(msg.payload));
+        client.on('error', (err) => retry('Sentiment version listener failed:', err));
+        await client.query('LISTEN sentiment_updated');
+        const result = await client.query('SELECT version FROM sentiment_version');
+        cache.setVersion(result.rows.length ? String(result.rows[0].version) : '0');
     } catch (err) {
-        res.status(500).json({ error: err.message });
+        retry('Could not listen for sentiment version:', err);
     }
-});
+};
+listenForVersion();
 
-// Fetch sentiment data for a specific ticker
-app.get('/sentiment/:ticker', async (req, res) => {
+// Serve a JSON endpoint through the cache, keyed by its full URL. Handlers return
+// { body, headers }. Clients revalidating with If-None-Match get a 304 without the body.
+const cached = (handler) => async (req, res) => {
     try {
-        const { ticker } = req.params;
-        const result = await pool.query(
-            'SELECT * FROM ticker_sentiment WHERE ticker = $1 ORDER BY calculated_at DESC',
-            [ticker]
-        );
-        res.json(result.rows);
-        console.log(result.rows);
+        let entry = cache.version === null ? null : cache.get(req.originalUrl);
+        if (!entry) {
+            const version = cache.version;
+            const result = await handler(req, res);
+            if (res.headersSent) return;
+            entry = cache.set(req.originalUrl, result.body, version, result.headers);
+        }
+        res.set(entry.headers);
+        res.set('ETag', entry.etag);
+        res.set('Cache-Control', 'no-cache');
+        if (req.fresh) {
+            return res.status(304).end();
+        }
+        res.type('json').send(entry.body);
     } catch (err) {
-        res.status(500).json({ error: err.message });
+        res.status(err instanceof BadRequest ? 400 : 500).json({ error: err.message });
     }
-});
+};
 
-// Fetch data based on ticker and subreddit
-app.get('/sentiment/:ticker/:subreddit', async (req, res) => {
-    try {
-        const { ticker, subreddit } = req.params;
-        const search_key = `${ticker}_${subreddit}`;
-        const result = await pool.query(
-            'SELECT * FROM ticker_sentiment WHERE id=$1 ORDER BY calculated_at DESC',
-            [search_key]
-        );
-        res.json(result.rows);
-        console.log(result.rows);
-    } catch (err) {
-        res.status(500).json({ error: err.message });
+// Rollup granularities maintained by the sentiment analyzer
+const PERIODS = ['day', 'week', 'month'];
+
+// Columns a client may ask for with ?fields=, by output name
+const SERIES_COLUMNS = {
+    ticker: 'ticker',
+    subreddit: 'subreddit',
+    sentiment: 'sentiment',
+    sample_size: 'sample_size',
+    date_str: "to_char(period_start, 'YYYY-MM-DD')",
+    calculated_at: 'updated_at',
+};
+const MAX_PAGE_SIZE = 1000;
+const MAX_POINTS = 2000;
+const DATE_PATTERN = /^\d{4}-\d{2}-\d{2}$/;
+
+class BadRequest extends Error {}
+
+const parseDate = (value, name) => {
+    if (value === undefined) return null;
+    if (!DATE_PATTERN.test(value) || isNaN(Date.parse(value))) {
+        throw new BadRequest(`${name} must be a YYYY-MM-DD date`);
     }
-});
+    return value;
+};
+
+const parseCount = (value, name, max) => {
+    if (value === undefined) return null;
+    const count = Number(value);
+    if (!Number.isInteger(count) || count < 1 || count > max) {
+        throw new BadRequest(`${name} must be an integer between 1 and ${max}`);
+    }
+    return count;
+};
+
+// A (ticker, subreddit) series at one period, in chart order.
+//   period=day|week|month  rollup granularity (default day)
+//   from, to               inclusive YYYY-MM-DD bounds on the period start
+//   fields                 comma separated subset of SERIES_COLUMNS (default all)
+//   limit, after           keyset pagination: up to limit rows with a period start after the
+//                          cursor; X-Next-Cursor carries the cursor of the next page
+//   points                 downsample to at most this many points, each the sample-weighted
+//                          average of a run of consecutive periods
+// The series is fixed by (ticker, subreddit, period), so the period start alone is the key.
+const rollupSeries = async (req, ticker, subreddit) => {
+    const period = req.query.period || 'day';
+    if (!PERIODS.includes(period)) {
+        throw new BadRequest(`period must be one of ${PERIODS.join(', ')}`);
+    }
+    const from = parseDate(req.query.from, 'from');
+    const to = parseDate(req.query.to, 'to');
+    const after = parseDate(req.query.after, 'after');
+    const limit = parseCount(req.query.limit, 'limit', MAX_PAGE_SIZE);
+    const points = parseCount(req.query.points, 'points', MAX_POINTS);
+    if (points && (limit || after)) {
+        throw new BadRequest('points cannot be combined with limit or after');
+    }
+
+    const fields = req.query.fields ? String(req.query.fields).split(',') : Object.keys(SERIES_COLUMNS);
+    const unknown = fields.filter((field) => !(field in SERIES_COLUMNS));
+    if (unknown.length || !fields.length) {
+        throw new BadRequest(`fields must be a subset of ${Object.keys(SERIES_COLUMNS).join(', ')}`);
+    }
+
+    const params = [ticker, subreddit, period];
+    const conditions = ['ticker = $1', 'subreddit = $2', 'period = $3'];
+    if (from) conditions.push(`period_start >= $${params.push(from)}`);
+    if (to) conditions.push(`period_start <= $${params.push(to)}`);
+    if (after) conditions.push(`period_start > $${params.push(after)}`);
+
+    let source = `sentiment_rollups WHERE ${conditions.join(' AND ')}`;
+    if (points) {
+        source = `(
+            SELECT ticker, subreddit, MIN(period_start) AS period_start,
+                   COALESCE(SUM(sentiment_sum) / NULLIF(SUM(sample_size), 0), 0) AS sentiment,
+                   SUM(sample_size)::bigint AS sample_size, MAX(updated_at) AS updated_at
+            FROM (
+                SELECT *, ntile($${params.push(points)}) OVER (ORDER BY period_start) AS bucket
+                FROM ${source}
+            ) AS periods
+            GROUP BY ticker, subreddit, bucket
+        ) AS downsampled`;
+    }
+
+    const columns = fields.map((field) => `${SERIES_COLUMNS[field]} AS ${field}`);
+    let query = `SELECT ${columns.join(', ')}, ${SERIES_COLUMNS.date_str} AS cursor FROM ${source} ORDER BY period_start`;
+    if (limit) query += ` LIMIT $${params.push(limit + 1)}`;
+
+    const result = await pool.query(query, params);
+    const rows = limit ? result.rows.slice(0, limit) : result.rows;
+    const headers = {};
+    if (limit && result.rows.length > limit) {
+        headers['X-Next-Cursor'] = rows[rows.length - 1].cursor;
+    }
+    rows.forEach((row) => delete row.cursor);
+    return { body: rows, headers };
+};
+
+// Fetch available tickers
+app.get('/tickers', cached(async () => {
+    const result = await pool.query('SELECT DISTINCT ticker FROM sentiment_catalog ORDER BY ticker');
+    return { body: result.rows };
+}));
+
+// Fetch available subreddits
+app.get('/subreddits', cached(async () => {
+    const result = await pool.query('SELECT DISTINCT subreddit FROM sentiment_catalog ORDER BY subreddit');
+    return { body: result.rows };
+}));
+
+// Fetch sentiment data for a specific ticker, across all subreddits
+app.get('/sentiment/:ticker', cached((req) => rollupSeries(req, req.params.ticker, 'all')));
+
+// Fetch data based on ticker and subreddit
+app.get('/sentiment/:ticker/:subreddit', cached((req) => rollupSeries(req, req.params.ticker, req.params.subreddit)));
+
+// Cache occupancy, version and hit rate
+app.get('/cache/stats', (req, res) => res.json(cache.stats()));
 
 // Start server
 const PORT = process.env.PORT || 5000;
 app.listen(PORT, () => console.log(`Server running on port ${PORT}`));
-console.log('Connection String:', process.env.NEON_CONNECTION_STRING);
@@ -4,6 +4,7 @@ import { LineChart, Line, XAxis, YAxis, Tooltip, CartesianGrid } from "recharts"
 import "./App.css";
 
 const API_BASE = import.meta.env.VITE_API_BASE || "http://localhost:5000";
+const CHART_POINTS = 500; // the API downsamples longer histories to this many points
 console.log(API_BASE);
 
 interface Ticker {
@@ -16,7 +17,7 @@ interface Subreddit {
 
 interface SentimentData {
   sentiment: number;
-  calculated_at: string;
+  calculated_at?: string;
   date_str: string;
 }
 
@@ -47,7 +48,9 @@ function App() {
       await Promise.all(
         subreddits.map(async (sub) => {
           try {
-            const res = await axios.get<SentimentData[]>(`${API_BASE}/sentiment/${selectedTicker}/${sub.subreddit}`);
+            const res = await axios.get<SentimentData[]>(`${API_BASE}/sentiment/${selectedTicker}/${sub.subreddit}`, {
+              params: { fields: "date_str,sentiment", points: CHART_POINTS },
+            });
             sentimentDataMap[sub.subreddit] = res.data
               .filter(entry => entry.date_str !== null) // Filter out entries with null date
               .reduce((acc, entry) => {
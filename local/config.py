@@ -0,0 +1,4 @@
+# Tickers and subreddits the local scripts work on by default. Kept free of imports so any
+# script can read them without loading PRAW, NLTK or VADER.
+TICKERS = ['AAPL', 'GOOG', 'GOOGL', 'AMZN', 'TSLA', 'MSFT']
+SUBREDDITS = ['stocks', 'wallstreetbets', 'investing', 'daytrading', 'stockmarket']
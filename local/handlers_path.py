@@ -0,0 +1,14 @@
+import os
+import sys
+from dotenv import load_dotenv
+
+# The local scripts share db and preprocessor with the Lambda handlers. Import this module
+# before them: .env has to be loaded before the handlers read their settings.
+load_dotenv()
+# Local batch jobs run longer statements than the handlers
+os.environ.setdefault('DB_STATEMENT_TIMEOUT_MS', '300000')
+
+# Appended, so the local sentiment_analyzer and reddit_scraper still shadow the handlers' ones
+HANDLERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'src', 'handlers')
+if HANDLERS_DIR not in sys.path:
+    sys.path.append(HANDLERS_DIR)
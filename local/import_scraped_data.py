@@ -0,0 +1,264 @@
+import argparse
+import csv
+import glob
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+import handlers_path  # loads .env and puts the handlers' shared modules on the path
+from db import connect_db, release_db
+from post_store import created_at_utc
+from tickers import mentioned_tickers, post_text
+
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 10000))
+SCRAPED_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scraped_data')
+
+# reddit_posts_<subreddit>_<ticker>.csv, subreddit names can contain underscores, tickers cannot
+FILENAME_PATTERN = re.compile(r'^reddit_posts_(?P<subreddit>\w+)_(?P<ticker>[A-Za-z.]+)\.csv$')
+
+# Post bodies can be larger than the default csv field limit
+csv.field_size_limit(sys.maxsize)
+
+STAGING_COLUMNS = ['post_id', 'ticker', 'subreddit', 'title', 'content', 'processed_content', 'score', 'created_at', 'created_date', 'sentiment', 'weighted_sentiment']
+
+# A post is stored under one ticker, as collect_data does with tickers.primary_ticker: the
+# earliest of its files' tickers mentioned in its title or body, else the first of them
+# alphabetically. The exports list the same post under every ticker searched, so the filename
+# alone does not decide. mentioned is the post's mentions among every ticker imported.
+def attribute_ticker(mentioned, tickers):
+    for ticker in mentioned:
+        if ticker in tickers:
+            return ticker
+    return min(tickers)
+
+# Whether files read later can still change a post's ticker: once the ticker that would win
+# across all files is among the post's own, none can
+def attribution_settled(mentioned, tickers, all_tickers):
+    return (mentioned[0] if mentioned else all_tickers[0]) in tickers
+
+# Stream posts from the CSV exports (Date, PostID, Title, Content, Score, Comments, URL) in one
+# pass. The csv module handles quoted multi-line content; a post found in several files is kept
+# once, with the subreddit of the first file it appears in. Posts whose ticker depends on files
+# not read yet are held back until they settle, or until every file has been read.
+def iter_csv_posts(paths, stats):
+    files = []
+    for path in paths:
+        match = FILENAME_PATTERN.match(os.path.basename(path))
+        if not match:
+            print(f"Skipping {path}, expected reddit_posts_<subreddit>_<ticker>.csv")
+            continue
+        files.append((path, match))
+    all_tickers = sorted({match.group('ticker') for path, match in files})
+
+    seen = set()
+    # post_id -> (post, mentioned, tickers of the files it was found in so far)
+    held = {}
+    for path, match in files:
+        file_ticker = match.group('ticker')
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                stats['read'] += 1
+                post_id = row.get('PostID')
+                if post_id in seen:
+                    stats['duplicates'] += 1
+                    if post_id in held:
+                        post, mentioned, tickers = held[post_id]
+                        tickers.add(file_ticker)
+                        if attribution_settled(mentioned, tickers, all_tickers):
+                            del held[post_id]
+                            post['ticker'] = attribute_ticker(mentioned, tickers)
+                            yield post
+                    continue
+                seen.add(post_id)
+                try:
+                    created_at = created_at_utc(row['Date'])
+                    post = {
+                        'post_id': row['PostID'],
+                        'ticker': None,
+                        'subreddit': match.group('subreddit'),
+                        'title': row['Title'],
+                        'content': row['Content'],
+                        'processed_content': None,
+                        'score': int(row['Score']),
+                        'created_at': created_at,
+                        'created_date': created_at.date(),
+                        'sentiment': None,
+                        'weighted_sentiment': None
+                    }
+                    mentioned = mentioned_tickers(post_text(row['Title'], row['Content']), all_tickers)
+                except (KeyError, TypeError, ValueError) as e:
+                    stats['invalid'] += 1
+                    print(f"Skipping malformed row {post_id} in {os.path.basename(path)}: {e}")
+                    continue
+                tickers = {file_ticker}
+                if attribution_settled(mentioned, tickers, all_tickers):
+                    post['ticker'] = attribute_ticker(mentioned, tickers)
+                    yield post
+                else:
+                    held[post_id] = (post, mentioned, tickers)
+
+    stats['held'] = len(held)
+    for post, mentioned, tickers in held.values():
+        post['ticker'] = attribute_ticker(mentioned, tickers)
+        yield post
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Optional CPU work on a chunk before it is loaded. Scored posts are written with their
+# sentiment, so the incremental analyzer skips them: fold them into ticker_sentiment with a
+# full_rebuild run afterwards.
+def enrich_chunk(posts, preprocess=False, score=False, executor=None):
+    if preprocess or score:
+        from preprocess_reddit import preprocess_texts
+        processed = preprocess_texts([post['content'] for post in posts], executor)
+        for post, processed_content in zip(posts, processed):
+            post['processed_content'] = processed_content
+    if score:
+        from sentiment_analyzer import calculate_sentiment
+        for post in posts:
+            post['sentiment'] = calculate_sentiment(post['processed_content'])
+            post['weighted_sentiment'] = post['sentiment'] * post['score']
+    return posts
+
+# One COPY csv field. Strings are always quoted, so an empty string stays an empty string
+# while None is written as an unquoted empty field and loads as NULL. Postgres text cannot hold NUL.
+def csv_field(value):
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""').replace('\x00', '') + '"'
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+def encode_chunk(posts):
+    buffer = io.StringIO()
+    for post in posts:
+        buffer.write(','.join(csv_field(post[column]) for column in STAGING_COLUMNS))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
+
+def create_staging_table(cursor):
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS reddit_posts_import (
+            post_id TEXT,
+            ticker TEXT,
+            subreddit TEXT,
+            title TEXT,
+            content TEXT,
+            processed_content TEXT,
+            score INTEGER,
+            created_at TIMESTAMP,
+            created_date DATE,
+            sentiment DOUBLE PRECISION,
+            weighted_sentiment DOUBLE PRECISION
+        ) ON COMMIT DELETE ROWS
+    """)
+
+# COPY a chunk into the staging table and merge it into reddit_posts in the same transaction.
+# Posts already stored are left untouched. Returns the number of posts inserted and the
+# number dropped for being older than the retention cutoff.
+def load_chunk(conn, posts):
+    cursor = conn.cursor()
+    try:
+        cursor.copy_expert(f"COPY reddit_posts_import ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", encode_chunk(posts))
+        # Posts stored before keep the created_date they were first stored under
+        cursor.execute("""
+            INSERT INTO reddit_post_ids (post_id, created_date)
+            SELECT post_id, created_date FROM reddit_posts_import
+            ON CONFLICT (post_id) DO NOTHING
+        """)
+        cursor.execute("""
+            UPDATE reddit_posts_import AS i SET created_date = r.created_date
+            FROM reddit_post_ids AS r
+            WHERE r.post_id = i.post_id AND r.created_date <> i.created_date
+        """)
+        cursor.execute("SELECT ensure_reddit_posts_partitions(ARRAY(SELECT DISTINCT created_date FROM reddit_posts_import))")
+        # Months before the retention cutoff have been archived and have no partition
+        cutoff = cursor.fetchone()[0]
+        expired = 0
+        if cutoff:
+            cursor.execute("DELETE FROM reddit_posts_import WHERE created_date < %s", (cutoff,))
+            expired = cursor.rowcount
+        cursor.execute(f"""
+            WITH inserted AS (
+                INSERT INTO reddit_posts ({', '.join(STAGING_COLUMNS)})
+                SELECT {', '.join(STAGING_COLUMNS)} FROM reddit_posts_import
+                ON CONFLICT (post_id, created_date) DO NOTHING
+                RETURNING 1
+            )
+            SELECT COUNT(*) FROM inserted
+        """)
+        inserted = cursor.fetchone()[0]
+        conn.commit()
+        return inserted, expired
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# Import every CSV in chunks of chunk_size posts, one transaction per chunk
+def import_files(conn, paths, chunk_size=IMPORT_CHUNK_SIZE, preprocess=False, score=False, executor=None):
+    stats = {'read': 0, 'duplicates': 0, 'invalid': 0, 'held': 0, 'inserted': 0, 'skipped': 0, 'expired': 0}
+    cursor = conn.cursor()
+    create_staging_table(cursor)
+    conn.commit()
+    cursor.close()
+
+    start = time.perf_counter()
+    for posts in chunked(iter_csv_posts(paths, stats), chunk_size):
+        enrich_chunk(posts, preprocess, score, executor)
+        inserted, expired = load_chunk(conn, posts)
+        stats['inserted'] += inserted
+        stats['expired'] += expired
+        stats['skipped'] += len(posts) - inserted - expired
+        elapsed = time.perf_counter() - start
+        print(f"Imported {stats['inserted']} posts ({stats['skipped']} already stored, {stats['expired']} past retention), {stats['read'] / elapsed:.0f} rows/s")
+
+    stats['seconds'] = round(time.perf_counter() - start, 3)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import scraped_data CSV exports into reddit_posts')
+    parser.add_argument('paths', nargs='*', help='CSV files to import (default: every reddit_posts_*.csv in scraped_data)')
+    parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help=f'Posts per COPY and transaction (default: {IMPORT_CHUNK_SIZE})')
+    parser.add_argument('--preprocess', action='store_true', help='Fill processed_content on the way in')
+    parser.add_argument('--score', action='store_true', help='Also score sentiment on the way in (implies --preprocess); run the analyzer with full_rebuild afterwards')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for preprocessing (default: 1, no pool)')
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob(os.path.join(SCRAPED_DATA_DIR, 'reddit_posts_*.csv')))
+    conn = connect_db(autocommit=False)
+    if not conn:
+        return
+
+    executor = None
+    if (args.preprocess or args.score) and args.workers > 1:
+        from preprocess_reddit import init_worker
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker)
+    try:
+        stats = import_files(conn, paths, args.chunk_size, args.preprocess, args.score, executor)
+        print("Import completed:", stats)
+        print(f"Skipped {stats['duplicates']} rows of posts already read from another file")
+        if args.score:
+            print("Run the sentiment analyzer with full_rebuild to fold the imported scores into ticker_sentiment")
+    finally:
+        if executor:
+            executor.shutdown()
+        release_db(conn)
+
+if __name__ == "__main__":
+    main()
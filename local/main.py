@@ -1,10 +1,111 @@
-import subprocess
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import handlers_path  # loads .env and puts the handlers' shared modules on the path
+from config import TICKERS, SUBREDDITS
+from db import connect_db, release_db
 
-# Run wrapper.py
-subprocess.run(["python3", "wrapper.py"])
+DB_BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', 500))
 
-# Run preprocess_reddit.py
-subprocess.run(["python3", "preprocess_reddit.py"])
+STAGES = ['scrape', 'preprocess', 'analyze']
 
-# Run sentiment_analyzer.py
-subprocess.run(["python3", "sentiment_analyzer.py"])
+# Seconds spent in each stage's own work and items it handled. Streamed stages interleave,
+# so each one only counts the time inside its own calls.
+def new_timings(stages):
+    return {stage: {'seconds': 0.0, 'items': 0} for stage in stages}
+
+def timed_stream(timings, stage, iterable):
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            timings[stage]['seconds'] += time.perf_counter() - start
+            return
+        timings[stage]['seconds'] += time.perf_counter() - start
+        timings[stage]['items'] += 1
+        yield item
+
+def timed_call(timings, stage, fn, *args, items=0):
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        timings[stage]['seconds'] += time.perf_counter() - start
+        timings[stage]['items'] += items
+
+def report_timings(timings, total_seconds):
+    print(f"{'stage':<12}{'seconds':>10}{'items':>10}{'items/s':>10}")
+    for stage, timing in timings.items():
+        rate = timing['items'] / timing['seconds'] if timing['seconds'] else 0
+        print(f"{stage:<12}{timing['seconds']:>10.2f}{timing['items']:>10}{rate:>10.1f}")
+    print(f"{'total':<12}{total_seconds:>10.2f}")
+
+# Scraped posts flow through preprocessing and into the database in batches, in memory, with
+# one shared Reddit client and DB pool. Preprocessing then also clears any backlog left in the
+# database by earlier runs, and the analyzer aggregates what is stored.
+def run_pipeline(stages, tickers, subreddits, limit=100, batch_size=DB_BATCH_SIZE, executor=None):
+    timings = new_timings([stage for stage in ['scrape', 'preprocess', 'store', 'analyze'] if stage in stages or (stage == 'store' and 'scrape' in stages)])
+    started = time.perf_counter()
+
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        # Stage modules pull in PRAW, NLTK and VADER, so only the selected ones are imported
+        if 'preprocess' in stages:
+            from preprocess_reddit import preprocess_texts, preprocess_data
+
+        if 'scrape' in stages:
+            from wrapper import scrape_posts, store_in_db, batched
+            posts = timed_stream(timings, 'scrape', scrape_posts(tickers, subreddits, limit))
+            for batch in batched(posts, batch_size):
+                if 'preprocess' in stages:
+                    processed = timed_call(timings, 'preprocess', preprocess_texts, [post['content'] for post in batch], executor, items=len(batch))
+                    for post, processed_content in zip(batch, processed):
+                        post['processed_content'] = processed_content
+                timed_call(timings, 'store', store_in_db, conn, batch, batch_size, items=len(batch))
+
+        if 'preprocess' in stages:
+            for ticker in tickers:
+                timed_call(timings, 'preprocess', preprocess_data, ticker, executor)
+
+        if 'analyze' in stages:
+            from sentiment_analyzer import analyze_sentiment
+            timed_call(timings, 'analyze', analyze_sentiment, conn, tickers, subreddits, batch_size)
+    finally:
+        release_db(conn)
+
+    report_timings(timings, time.perf_counter() - started)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description='Scrape, preprocess and analyze Reddit posts in one process')
+    parser.add_argument('--stages', type=str, default=','.join(STAGES), help=f'Comma separated stages to run, in pipeline order (default: {",".join(STAGES)})')
+    parser.add_argument('--tickers', type=str, default=','.join(TICKERS), help=f'Comma separated tickers (default: {",".join(TICKERS)})')
+    parser.add_argument('--subreddits', type=str, default=','.join(SUBREDDITS), help=f'Comma separated subreddits (default: {",".join(SUBREDDITS)})')
+    parser.add_argument('--limit', type=int, default=100, help='Posts to fetch per ticker and subreddit (default: 100)')
+    parser.add_argument('--batch-size', type=int, default=DB_BATCH_SIZE, help=f'Posts per preprocessing and storage batch (default: {DB_BATCH_SIZE})')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for preprocessing (default: 1, no pool)')
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages {', '.join(unknown)}, choose from {', '.join(STAGES)}")
+    stages = [stage for stage in STAGES if stage in stages]
+
+    executor = None
+    if 'preprocess' in stages and args.workers > 1:
+        from preprocess_reddit import init_worker
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker)
+    try:
+        run_pipeline(stages, args.tickers.split(','), args.subreddits.split(','), args.limit, args.batch_size, executor)
+    finally:
+        if executor:
+            executor.shutdown()
+
+if __name__ == "__main__":
+    main()
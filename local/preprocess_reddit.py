@@ -1,114 +1,141 @@
 import nltk
-import pandas as pd
-import psycopg2
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
-import re
+from psycopg2.extras import execute_values
 import os
-from dotenv import load_dotenv
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+import handlers_path  # loads .env and puts the handlers' shared modules on the path
+from config import TICKERS
+from db import connect_db, release_db
+from preprocessor import Preprocessor
 
-# Load environment variables
-load_dotenv()
-DB_NAME = os.getenv('DB_NAME')
-DB_USER = os.getenv('DB_USER')
-DB_PASSWORD = os.getenv('DB_PASSWORD')
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT')
+DB_BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', 500))
+PREPROCESS_CHUNK_SIZE = int(os.getenv('PREPROCESS_CHUNK_SIZE', 5000))
+PREPROCESS_TASK_SIZE = int(os.getenv('PREPROCESS_TASK_SIZE', 200))
+# Next to this script by default, so a run from another directory still resumes
+PREPROCESS_CHECKPOINT = os.getenv('PREPROCESS_CHECKPOINT', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.preprocess_checkpoint.json'))
 
 # Initialize NLTK resources
 nltk.download('punkt')
 nltk.download('stopwords')
 nltk.download('wordnet')
 
-# Connect to the PostgreSQL database
-def connect_db():
+# Built on first use and kept for the life of the process, so the stopwords and the lemma
+# cache are loaded once. Each worker process of an executor builds its own.
+preprocessor = None
+
+def get_preprocessor():
+    global preprocessor
+    if preprocessor is None:
+        preprocessor = Preprocessor()
+    return preprocessor
+
+def init_worker():
+    get_preprocessor()
+
+def preprocess_chunk(texts):
+    return get_preprocessor().process_many(texts)
+
+# Shard texts into chunks across the executor's worker processes, results come back in input order
+def preprocess_texts(texts, executor=None, chunk_size=PREPROCESS_TASK_SIZE):
+    texts = list(texts)
+    if executor is None:
+        return get_preprocessor().process_many(texts)
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    return [text for chunk in executor.map(preprocess_chunk, chunks) for text in chunk]
+
+# Stream unprocessed posts for a ticker in fixed-size chunks of (post_id, content) from a
+# server-side cursor. WITH HOLD keeps the cursor open across the write-back commits.
+def fetch_posts_from_db(conn, ticker, chunk_size=PREPROCESS_CHUNK_SIZE, after_post_id=None):
+    cursor = conn.cursor(name=f'preprocess_{ticker}', withhold=True)
     try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        return conn
-    except Exception as e:
-        print("Error connecting to the database:", e)
-        return None
-
-# Convert text to lowercase
-def make_lowercase(data):
-    data['content'] = data['content'].apply(lambda x: x.lower())
-    return data
-
-# Remove stopwords from text
-def remove_stopwords(data):
-    stop_words = set(stopwords.words('english'))
-    data['content'] = data['content'].apply(lambda sentence: " ".join([w for w in word_tokenize(re.sub(r'[^\w\s]', '', sentence)) if w not in stop_words]))
-    return data
-
-# Lemmatize words in the text
-def lemmatize_words(data):
-    lemmatizer = WordNetLemmatizer()
-    data['content'] = data['content'].apply(lambda sentence: " ".join([lemmatizer.lemmatize(word) for word in word_tokenize(sentence)]))
-    return data
-
-# Clean the content of special characters, URLs, etc.
-def clean_text(data):
-    data['content'] = data['content'].apply(lambda x: re.sub(r'http\S+|www\S+|https\S+', '', x))  # Remove URLs
-    data['content'] = data['content'].apply(lambda x: re.sub(r'[^a-zA-Z\s]', '', x))  # Remove non-alphabetical characters
-    return data
-
-# Fetch posts from the database
-def fetch_posts_from_db(conn, ticker):
-    query = f"""
-        SELECT post_id, content
-        FROM reddit_posts
-        WHERE ticker = '{ticker}' AND processed_content IS NULL
-    """
-    df = pd.read_sql_query(query, conn)
-    return df
-
-# Update the processed content in the database
-def update_processed_content(conn, post_id, processed_content):
+        cursor.execute("""
+            SELECT post_id, content
+            FROM reddit_posts
+            WHERE ticker = %s AND processed_content IS NULL AND post_id > %s
+            ORDER BY post_id
+        """, (ticker, after_post_id or ''))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+# Last committed post_id per ticker, so an interrupted run picks up where it stopped
+def load_checkpoint():
+    try:
+        with open(PREPROCESS_CHECKPOINT) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_checkpoint(checkpoint):
+    with open(PREPROCESS_CHECKPOINT, 'w') as f:
+        json.dump(checkpoint, f)
+
+# Update the processed content in the database, one statement and commit per batch
+def update_processed_contents(conn, rows, batch_size=DB_BATCH_SIZE):
     try:
         cursor = conn.cursor()
         update_query = """
-            UPDATE reddit_posts
-            SET processed_content = %s
-            WHERE post_id = %s
+            UPDATE reddit_posts AS p
+            SET processed_content = v.processed_content
+            FROM (VALUES %s) AS v(post_id, processed_content)
+            WHERE p.post_id = v.post_id
         """
-        cursor.execute(update_query, (processed_content, post_id))
-        conn.commit()
+        for start in range(0, len(rows), batch_size):
+            execute_values(cursor, update_query, rows[start:start + batch_size], page_size=batch_size)
+            conn.commit()
         cursor.close()
+        return True
     except Exception as e:
+        conn.rollback()
         print("Error updating processed content:", e)
+        return False
 
 # Main function to preprocess data
-def preprocess_data(ticker):
-    conn = connect_db()
+def preprocess_data(ticker, executor=None, chunk_size=PREPROCESS_CHUNK_SIZE):
+    conn = connect_db(autocommit=False)
     if not conn:
         return
 
-    # Fetch posts for the given ticker
-    posts_df = fetch_posts_from_db(conn, ticker)
+    checkpoint = load_checkpoint()
+    if ticker in checkpoint:
+        print(f"Resuming {ticker} after post {checkpoint[ticker]}")
+
+    # Each chunk is preprocessed and written back before the next one is read
+    processed_posts = 0
+    for rows in fetch_posts_from_db(conn, ticker, chunk_size, checkpoint.get(ticker)):
+        post_ids = [post_id for post_id, _ in rows]
+        processed = preprocess_texts([content for _, content in rows], executor)
+        if not update_processed_contents(conn, list(zip(post_ids, processed))):
+            print(f"Stopping {ticker}, rerun to resume after post {checkpoint.get(ticker)}")
+            release_db(conn)
+            return
 
-    # Preprocess the data
-    posts_df = make_lowercase(posts_df)
-    posts_df = remove_stopwords(posts_df)
-    posts_df = lemmatize_words(posts_df)
-    posts_df = clean_text(posts_df)
+        checkpoint[ticker] = post_ids[-1]
+        save_checkpoint(checkpoint)
+        processed_posts += len(rows)
+        print(f"Preprocessed {processed_posts} posts for {ticker}")
 
-    # Update the processed content in the database
-    for index, row in posts_df.iterrows():
-        update_processed_content(conn, row['post_id'], row['content'])
+    checkpoint.pop(ticker, None)
+    save_checkpoint(checkpoint)
 
     print(f"Preprocessing completed for {ticker} and updated in the database.")
-    conn.close()
+    release_db(conn)
 
 if __name__ == "__main__":
-    TICKERS = ['AAPL', 'GOOG', 'GOOGL', 'AMZN', 'TSLA', 'MSFT']
+    parser = argparse.ArgumentParser(description='Preprocess unprocessed Reddit posts in the database')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for preprocessing (default: 1, no pool)')
+    parser.add_argument('--chunk-size', type=int, default=PREPROCESS_CHUNK_SIZE, help=f'Posts read, preprocessed and written back per chunk (default: {PREPROCESS_CHUNK_SIZE})')
+    args = parser.parse_args()
+
+    executor = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) if args.workers > 1 else None
     for ticker in TICKERS:
         print(f"Preprocessing data for {ticker}...")
-        preprocess_data(ticker)
+        preprocess_data(ticker, executor, args.chunk_size)
+    if executor:
+        executor.shutdown()
     print("Preprocessing completed for all tickers.")
@@ -1,6 +1,7 @@
 import praw
 import json
 import os
+import sys
 from dotenv import load_dotenv
 import argparse
 
@@ -12,11 +13,11 @@ user_agent = os.getenv('REDDIT_USER_AGENT')
 
 reddit = praw.Reddit(client_id=client_id, client_secret=client_secret, user_agent=user_agent)
 
-def get_posts(subreddit_name, query, limit):
-    posts_list = []
+# One shared client per process, importing this module is enough to reuse it
+def iter_posts(subreddit_name, query, limit):
     subreddit = reddit.subreddit(subreddit_name)
     for post in subreddit.search(query, sort='new', limit=limit):
-        posts_list.append({
+        yield {
             'id': post.id,
             'title': post.title,
             'content': post.selftext,
@@ -24,8 +25,10 @@ def get_posts(subreddit_name, query, limit):
             'created_utc': post.created_utc,
             'url': post.url,
             'num_comments': post.num_comments
-        })
-    return posts_list
+        }
+
+def get_posts(subreddit_name, query, limit):
+    return list(iter_posts(subreddit_name, query, limit))
 
 # Main function to parse arguments and run the scraper
 def main():
@@ -33,9 +36,17 @@ def main():
     parser.add_argument('--subreddit', type=str, required=True, help='Subreddit to search in (e.g., stocks)')
     parser.add_argument('--stock', type=str, required=True, help='Stock keyword to search for (e.g., Tesla or TSLA)')
     parser.add_argument('--limit', type=int, default=100, help='Number of posts to fetch (default: 100)')
+    parser.add_argument('--format', type=str, choices=['json', 'ndjson'], default='json', help='json: one indented array once every post is fetched, ndjson: one compact post per line as it arrives (default: json)')
 
     args = parser.parse_args()
-    
+
+    if args.format == 'ndjson':
+        # Each post is written and flushed as soon as search yields it
+        for post in iter_posts(args.subreddit, args.stock, args.limit):
+            sys.stdout.write(json.dumps(post, separators=(',', ':')) + "\n")
+            sys.stdout.flush()
+        return
+
     # Get posts
     new_posts = get_posts(args.subreddit, args.stock, args.limit)
     
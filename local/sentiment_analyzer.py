@@ -1,36 +1,12 @@
-import psycopg2
 from psycopg2 import sql
 from datetime import datetime
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 import os
-from dotenv import load_dotenv
+import handlers_path  # loads .env and puts the handlers' shared modules on the path
+from config import TICKERS, SUBREDDITS
+from db import connect_db, release_db
 
-# Load environment variables
-load_dotenv()
-DB_NAME = os.getenv('DB_NAME')
-DB_USER = os.getenv('DB_USER')
-DB_PASSWORD = os.getenv('DB_PASSWORD')
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT')
-
-TICKERS = ['AAPL', 'GOOG', 'GOOGL', 'AMZN', 'TSLA', 'MSFT']
-SUBREDDITS = ['stocks', 'wallstreetbets', 'investing', 'daytrading', 'stockmarket']
-
-# Connect to PostgreSQL
-def connect_db():
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        conn.autocommit = True
-        return conn
-    except Exception as e:
-        print("Error connecting to the database:", e)
-        return None
+DB_BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', 500))
 
 # Perform sentiment analysis on the content
 analyzer = SentimentIntensityAnalyzer()
@@ -38,36 +14,45 @@ def calculate_sentiment(text):
     score = analyzer.polarity_scores(text)
     return score['compound']
 
-# Analyze sentiment for each ticker
-def analyze_sentiment(conn):
+# Stream all requested (ticker, subreddit) pairs from one query through a server-side cursor
+def fetch_posts(conn, tickers, subreddits, batch_size=DB_BATCH_SIZE):
+    cursor = conn.cursor(name='analyze_sentiment_posts', withhold=True)
+    cursor.itersize = batch_size
+    try:
+        cursor.execute(sql.SQL("""
+            SELECT ticker, subreddit, processed_content, score FROM reddit_posts
+            WHERE ticker = ANY(%s) AND subreddit = ANY(%s) AND processed_content IS NOT NULL
+        """), (list(tickers), list(subreddits)))
+        yield from cursor
+    finally:
+        cursor.close()
+
+# Analyze sentiment for each ticker. These are all-time averages, kept in the undated
+# (id, NULL date) row of each bucket.
+def analyze_sentiment(conn, tickers=TICKERS, subreddits=SUBREDDITS, batch_size=DB_BATCH_SIZE):
+    # Weighted sentiment and post counts per (ticker, subreddit)
+    subreddit_sentiment = {}
+    subreddit_posts = {}
+    for ticker, subreddit, content, score in fetch_posts(conn, tickers, subreddits, batch_size):
+        sentiment = calculate_sentiment(content)
+        subreddit_sentiment[(ticker, subreddit)] = subreddit_sentiment.get((ticker, subreddit), 0) + sentiment * score
+        subreddit_posts[(ticker, subreddit)] = subreddit_posts.get((ticker, subreddit), 0) + 1
+
     cursor = conn.cursor()
-    for ticker in TICKERS:
+    for ticker in tickers:
         print(f"Analyzing sentiment for ticker: {ticker}")
         total_sentiment = 0
         total_posts_all = 0  # Total number of posts across all subreddits
         
-        for subreddit in SUBREDDITS:
-            print(f"  Processing subreddit: {subreddit}")
-            cursor.execute(sql.SQL("""
-                SELECT processed_content, score FROM reddit_posts
-                WHERE ticker = %s AND subreddit = %s AND processed_content IS NOT NULL
-            """), (ticker, subreddit))
-            posts = cursor.fetchall()
-            subreddit_sentiment = 0
-            total_posts = 0  # Number of posts for this subreddit
-            
-            for content, score in posts:
-                sentiment = calculate_sentiment(content)
-                weighted_sentiment = sentiment * score
-                subreddit_sentiment += weighted_sentiment
-                total_posts += 1  # Count each post
+        for subreddit in subreddits:
+            total_posts = subreddit_posts.get((ticker, subreddit), 0)  # Number of posts for this subreddit
             
             if total_posts > 0:  # Calculate subreddit average sentiment
-                avg_subreddit_sentiment = subreddit_sentiment / total_posts
+                avg_subreddit_sentiment = subreddit_sentiment[(ticker, subreddit)] / total_posts
                 cursor.execute(sql.SQL("""
                     INSERT INTO ticker_sentiment (id, ticker, subreddit, sentiment, sample_size, calculated_at) 
                     VALUES (%s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (id) 
+                    ON CONFLICT (id, date) 
                     DO UPDATE SET 
                         sentiment = EXCLUDED.sentiment, 
                         sample_size = EXCLUDED.sample_size, 
@@ -75,16 +60,16 @@ def analyze_sentiment(conn):
                 """), (f"{ticker}_{subreddit}", ticker, subreddit, avg_subreddit_sentiment, total_posts, datetime.now()))
                 print(f"    Inserted/Updated sentiment for {ticker} in {subreddit}: {avg_subreddit_sentiment} (posts: {total_posts})")
             
-            # Accumulate for total sentiment
-            total_sentiment += subreddit_sentiment
-            total_posts_all += total_posts
+                # Accumulate for total sentiment
+                total_sentiment += subreddit_sentiment[(ticker, subreddit)]
+                total_posts_all += total_posts
             
         if total_posts_all > 0:  # Calculate total average sentiment
             avg_total_sentiment = total_sentiment / total_posts_all
             cursor.execute(sql.SQL("""
                 INSERT INTO ticker_sentiment (id, ticker, subreddit, sentiment, sample_size, calculated_at) 
                 VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (id) 
+                ON CONFLICT (id, date) 
                 DO UPDATE SET 
                     sentiment = EXCLUDED.sentiment, 
                     sample_size = EXCLUDED.sample_size, 
@@ -98,7 +83,7 @@ if __name__ == "__main__":
     conn = connect_db()
     if conn:
         analyze_sentiment(conn)
-        conn.close()
+        release_db(conn)
         print("Sentiment analysis completed.")
     else:
         print("Failed to connect to the database.")
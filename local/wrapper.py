@@ -1,104 +1,162 @@
-import subprocess
-import psycopg2
 from psycopg2 import sql
-from datetime import datetime
-import os
+from psycopg2.extras import execute_values
+import argparse
 import json
-from dotenv import load_dotenv
-
-# Database connection details
-load_dotenv()
-DB_NAME = os.getenv('DB_NAME')
-DB_USER = os.getenv('DB_USER')
-DB_PASSWORD = os.getenv('DB_PASSWORD')
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT')
+import os
+import subprocess
+import sys
+from itertools import islice
+import handlers_path  # loads .env and puts the handlers' shared modules on the path
+from config import TICKERS, SUBREDDITS
+from db import connect_db, release_db
+from post_store import claim_post_dates, created_at_utc, ensure_partitions
+from reddit_scraper import iter_posts
 
-# List of tickers and subreddits
-TICKERS = ['AAPL', 'GOOG', 'GOOGL', 'AMZN', 'TSLA', 'MSFT']
-SUBREDDITS = ['stocks', 'wallstreetbets', 'investing', 'daytrading', 'stockmarket']
+DB_BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', 500))
+# Posts written per store_in_db call while a scrape is still streaming in
+WRAPPER_MICRO_BATCH_SIZE = int(os.getenv('WRAPPER_MICRO_BATCH_SIZE', 100))
+SCRAPER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reddit_scraper.py')
 
-# Connect to PostgreSQL
-def connect_db():
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        conn.autocommit = True
-        return conn
-    except Exception as e:
-        print("Error connecting to the database:", e)
-        return None
 
-# Store post data in the database
-def store_in_db(conn, posts):
+# Store post data in the database. Posts that went through in-pipeline preprocessing carry
+# processed_content, which also fills it in on already stored posts still waiting for it.
+def store_in_db(conn, posts, batch_size=DB_BATCH_SIZE):
+    totals = {'inserted': 0, 'updated': 0, 'skipped': 0, 'expired': 0}
     try:
         cursor = conn.cursor()
         cursor.execute("SET search_path TO public;")
+        # Conflicting rows are only returned when the WHERE lets the update through, rows
+        # for posts claim_post_dates just claimed were inserted
         insert_query = sql.SQL("""
-            INSERT INTO reddit_posts (post_id, ticker, subreddit, title, content, score, created_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (post_id) DO NOTHING;
+            INSERT INTO reddit_posts (post_id, ticker, subreddit, title, content, processed_content, score, created_at, created_date)
+            VALUES %s
+            ON CONFLICT (post_id, created_date) DO UPDATE SET
+            processed_content = EXCLUDED.processed_content
+            WHERE reddit_posts.processed_content IS NULL AND EXCLUDED.processed_content IS NOT NULL
+            RETURNING post_id;
         """)
-        
-        for post in posts:
-            cursor.execute(insert_query, (
+
+        rows = list({
+            post['id']: (
                 post['id'],
                 post['ticker'],
                 post['subreddit'],
                 post['title'],
                 post['content'],
+                post.get('processed_content'),
                 post['score'],
-                datetime.fromtimestamp(post['created_utc'])
-            ))
+                created_at_utc(post['created_utc']),
+                created_at_utc(post['created_utc']).date()
+            )
+            for post in posts
+        }.values())
+        # Posts stored before keep the created_date they were first stored under
+        stored_dates, new_posts = claim_post_dates(cursor, {row[0]: row[-1] for row in rows})
+        rows = [row[:-1] + (stored_dates.get(row[0], row[-1]),) for row in rows]
+        cutoff = ensure_partitions(cursor, {row[-1] for row in rows})
+        if cutoff:
+            kept = [row for row in rows if row[-1] >= cutoff]
+            totals['expired'] = len(rows) - len(kept)
+            if totals['expired']:
+                print(f"Dropped {totals['expired']} posts from before the retention cutoff {cutoff}")
+            rows = kept
+
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            results = execute_values(cursor, insert_query, batch, page_size=len(batch), fetch=True)
+            inserted = sum(1 for (post_id,) in results if post_id in new_posts)
+            updated = len(results) - inserted
+            skipped = len(batch) - len(results)
+            totals['inserted'] += inserted
+            totals['updated'] += updated
+            totals['skipped'] += skipped
+            print(f"Batch {start // batch_size + 1}: {inserted} inserted, {updated} preprocessed, {skipped} already stored")
         
         cursor.close()
     except Exception as e:
         print("Error storing data in the database:", e)
+    return totals
 
-# Main function to fetch and store data
-def main():
-    conn = connect_db()
-    if not conn:
-        return
-    
-    for ticker in TICKERS:
+# Stream posts for every ticker/subreddit pair through the shared Reddit client, tagged with
+# the pair they were found for. A failing pair is reported and skipped.
+def scrape_posts(tickers=TICKERS, subreddits=SUBREDDITS, limit=100):
+    for ticker in tickers:
         query = f'"{ticker}"'
-        for subreddit in SUBREDDITS:
+        for subreddit in subreddits:
             print(f"Fetching posts for {ticker} in r/{subreddit}...")
             try:
-                result = subprocess.run(
-                    ['python3', 'reddit_scraper.py', 
-                     '--subreddit', subreddit, 
-                     '--stock', query, 
-                     '--limit', '100'],
-                    capture_output=True,
-                    text=True
-                )
-                
-                if result.returncode != 0:
-                    print(f"Error fetching data: {result.stderr}")
-                    continue
-                
-                # Extract posts from JSON output
-                posts = json.loads(result.stdout)
-                
-                # Add additional metadata
-                for post in posts:
+                for post in iter_posts(subreddit, query, limit):
                     post['ticker'] = ticker
                     post['subreddit'] = subreddit
-                
-                # Store in PostgreSQL
-                store_in_db(conn, posts)
-                
+                    yield post
             except Exception as e:
                 print(f"Error processing {ticker} in r/{subreddit}: {e}")
-    
-    conn.close()
+
+# Same stream from a reddit_scraper.py process per pair, read line by line from its NDJSON
+# output as posts arrive. stderr is left on the terminal so it can never fill up and stall stdout.
+def scrape_posts_subprocess(tickers=TICKERS, subreddits=SUBREDDITS, limit=100):
+    for ticker in tickers:
+        query = f'"{ticker}"'
+        for subreddit in subreddits:
+            print(f"Fetching posts for {ticker} in r/{subreddit}...")
+            process = subprocess.Popen(
+                [sys.executable, SCRAPER_SCRIPT,
+                 '--subreddit', subreddit,
+                 '--stock', query,
+                 '--limit', str(limit),
+                 '--format', 'ndjson'],
+                stdout=subprocess.PIPE,
+                text=True
+            )
+            killed = False
+            try:
+                for line in process.stdout:
+                    if not line.strip():
+                        continue
+                    post = json.loads(line)
+                    post['ticker'] = ticker
+                    post['subreddit'] = subreddit
+                    yield post
+            except GeneratorExit:
+                # The consumer stopped reading, nothing to report
+                killed = True
+                process.kill()
+                raise
+            except Exception as e:
+                print(f"Error processing {ticker} in r/{subreddit}: {e}")
+                killed = True
+                process.kill()
+            finally:
+                process.stdout.close()
+                if process.wait() != 0 and not killed:
+                    print(f"Error fetching data for {ticker} in r/{subreddit}: scraper exited with {process.returncode}")
+
+# Group a stream into lists of up to size items
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+# Main function to fetch and store data, posts are written in micro-batches as they stream in
+def main():
+    parser = argparse.ArgumentParser(description='Scrape Reddit posts for the configured tickers and store them')
+    parser.add_argument('--limit', type=int, default=100, help='Posts to fetch per ticker and subreddit (default: 100)')
+    parser.add_argument('--batch-size', type=int, default=WRAPPER_MICRO_BATCH_SIZE, help=f'Posts per database write (default: {WRAPPER_MICRO_BATCH_SIZE})')
+    parser.add_argument('--subprocess', action='store_true', help='Run reddit_scraper.py per pair and stream its NDJSON output instead of scraping in-process')
+    args = parser.parse_args()
+
+    conn = connect_db()
+    if not conn:
+        return
+
+    scrape = scrape_posts_subprocess if args.subprocess else scrape_posts
+    for posts in batched(scrape(limit=args.limit), args.batch_size):
+        store_in_db(conn, posts)
+
+    release_db(conn)
 
 if __name__ == "__main__":
     main()